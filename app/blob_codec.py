@@ -0,0 +1,75 @@
+import hashlib
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+# Lone surrogates can come out of JSON-decoded logs; they must round-trip
+# exactly because the chain hashes the text as it was collected.
+TEXT_ERRORS = "surrogatepass"
+
+
+def raw_bytes(text):
+    return text.encode("utf-8", TEXT_ERRORS)
+
+
+def blob_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def preferred_codec():
+    return "zstd" if zstandard else "zlib"
+
+
+def compress(data, codec=None):
+    codec = codec or preferred_codec()
+
+    if codec == "zstd":
+        packed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    elif codec == "zlib":
+        packed = zlib.compress(data, ZLIB_LEVEL)
+    else:
+        raise ValueError(f"Unknown blob codec: {codec}")
+
+    # short lines do not shrink; keep them as they are
+    if len(packed) >= len(data):
+        return "raw", data
+    return codec, packed
+
+
+def decompress(codec, data):
+    if codec == "raw":
+        return data
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Blob is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    raise ValueError(f"Unknown blob codec: {codec}")
+
+
+# What a corrupted blob reads as. It never equals collected text, so the
+# chain reports the referencing event as tampered instead of erroring out.
+UNREADABLE = "\x00<unreadable evidence blob>"
+
+DECODE_ERRORS = (ValueError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def decode_blob(digest, codec, data):
+    # Blobs are content-addressed: text that does not hash back to its
+    # digest was altered in storage, even if it still decompresses.
+    try:
+        raw = decompress(codec, data)
+    except DECODE_ERRORS:
+        return UNREADABLE
+
+    if blob_digest(raw) != digest:
+        return UNREADABLE
+    return raw.decode("utf-8", TEXT_ERRORS)
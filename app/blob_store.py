@@ -0,0 +1,133 @@
+import argparse
+import json
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from app.models import EvidenceEvent, EvidenceBlob
+from app.blob_codec import raw_bytes, blob_digest, compress, decode_blob
+
+MIGRATE_BATCH = 5_000
+DECODE_CACHE_SIZE = 4_096
+
+_decoded = {}
+
+
+def pack_raw_log(text, blobs):
+    # Returns the reference for one payload, adding its blob to `blobs`
+    # (keyed by digest) the first time it is seen.
+    if text is None:
+        return None
+
+    data = raw_bytes(text)
+    digest = blob_digest(data)
+
+    if digest not in blobs:
+        codec, packed = compress(data)
+        blobs[digest] = {"digest": digest, "codec": codec, "size": len(data), "data": packed}
+
+    return digest
+
+
+def insert_blobs(session, blobs):
+    # Content-addressed, so a blob that is already stored is simply kept.
+    if blobs:
+        session.execute(insert(EvidenceBlob).on_conflict_do_nothing(index_elements=["digest"]), list(blobs))
+
+
+def blob_text(digest, codec, data):
+    # Decoded payloads for column queries that join evidence_blobs. Repeated
+    # lines (syscheck, firewall) are decompressed once. The key includes the
+    # stored bytes, so a blob rewritten in the database is decoded (and
+    # checked against its digest) again rather than served from memory.
+    key = (digest, codec, data)
+    text = _decoded.get(key)
+
+    if text is None:
+        if len(_decoded) >= DECODE_CACHE_SIZE:
+            _decoded.clear()
+        text = _decoded[key] = decode_blob(digest, codec, data)
+
+    return text
+
+
+def migrate_inline_logs(session, batch=MIGRATE_BATCH):
+    """
+    Moves raw_log text of rows stored before the blob store into
+    evidence_blobs. The text, and so every chain hash, is unchanged.
+    """
+    moved = 0
+
+    while True:
+        rows = session.query(EvidenceEvent.event_id, EvidenceEvent.raw_log_inline)\
+            .filter(EvidenceEvent.raw_ref.is_(None), EvidenceEvent.raw_log_inline.isnot(None))\
+            .limit(batch)\
+            .all()
+
+        if not rows:
+            return moved
+
+        blobs = {}
+        updates = [
+            {"event_id": event_id, "raw_ref": pack_raw_log(text, blobs), "raw_log_inline": None}
+            for event_id, text in rows
+        ]
+
+        insert_blobs(session, blobs.values())
+        session.bulk_update_mappings(EvidenceEvent, updates)
+        session.commit()
+        moved += len(rows)
+
+
+def blob_stats(session):
+    blobs, raw_size, stored_size = session.query(
+        func.count(EvidenceBlob.digest),
+        func.coalesce(func.sum(EvidenceBlob.size), 0),
+        func.coalesce(func.sum(func.length(EvidenceBlob.data)), 0)
+    ).one()
+
+    references = session.query(func.count(EvidenceEvent.event_id))\
+        .filter(EvidenceEvent.raw_ref.isnot(None))\
+        .scalar()
+
+    inline = session.query(func.count(EvidenceEvent.event_id))\
+        .filter(EvidenceEvent.raw_log_inline.isnot(None))\
+        .scalar()
+
+    return {
+        "blobs": blobs,
+        "referencing_events": references,
+        "inline_events": inline,
+        "raw_bytes": raw_size,
+        "stored_bytes": stored_size,
+        "compression_ratio": round(raw_size / stored_size, 2) if stored_size else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move inline raw_log payloads into the compressed blob store."
+    )
+    parser.add_argument("--batch", type=int, default=MIGRATE_BATCH)
+    parser.add_argument("--vacuum", action="store_true", help="reclaim freed pages afterwards")
+    args = parser.parse_args()
+
+    from app.database import init_db, engine, SessionLocal
+    init_db()
+
+    session = SessionLocal()
+    try:
+        moved = migrate_inline_logs(session, args.batch)
+        report = {"moved": moved, **blob_stats(session)}
+    finally:
+        session.close()
+
+    if args.vacuum:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+from app.rule_table import active_rules
+
+# Every alert field normalize() reads, plus the raw evidence line.
+NORMALIZER_FIELDS = [
+    "@timestamp",
+    "timestamp",
+    "id",
+    "location",
+    "full_log",
+
+    "agent.id",
+    "agent.name",
+    "agent.os.name",
+    "manager.name",
+
+    "rule.id",
+    "rule.level",
+    "rule.description",
+    "rule.groups",
+    "rule.mitre",
+
+    "decoder.name",
+    "predecoder.hostname",
+    "predecoder.program_name",
+
+    "data.srcip",
+    "data.src_ip",
+    "data.srcuser",
+    "data.user",
+    "data.dstuser",
+    "data.hostname",
+    "data.host",
+    "data.computer_name",
+    "data.win.system.computer"
+]
+
+
+class CollectionProfile:
+    """
+    Shapes the indexer query for a collection run.
+
+    noise_pushdown turns the is_noise() rules into query filters so noise is
+    never transferred. Only the rules that map onto indexed alert fields are
+    pushed down; is_noise() still runs on everything that arrives (e.g. a
+    target that came from decoder.name rather than location).
+
+    source_fields limits _source to what the normalizer reads. Alerts without
+    full_log then keep the projected document, not the full alert, as their
+    raw_log, so projection is a deliberate trade of evidence completeness for
+    volume and is off in the default profile.
+    """
+
+    def __init__(self, name, noise_pushdown=False, source_fields=None):
+        self.name = name
+        self.noise_pushdown = noise_pushdown
+        self.source_fields = source_fields
+
+    def noise_filters(self):
+        # read at call time so a rule reload also changes what is pushed down
+        rules = active_rules()
+
+        must_not = [
+            {"term": {"location": {"value": target, "case_insensitive": True}}}
+            for target in sorted(rules.noise_targets)
+        ]
+        must_not += [
+            {"prefix": {"rule.description": {"value": prefix, "case_insensitive": True}}}
+            for prefix in sorted(rules.noise_prefixes)
+        ]
+        must_not += [
+            {"wildcard": {"rule.description": {"value": f"*{kw}*", "case_insensitive": True}}}
+            for kw in sorted(rules.noise_keywords)
+        ]
+
+        return {
+            "filter": [{"range": {"rule.level": {"gte": rules.noise_min_severity}}}],
+            "must_not": must_not
+        }
+
+    def apply(self, body):
+        if self.noise_pushdown:
+            noise = self.noise_filters()
+            body["query"] = {
+                "bool": {
+                    "filter": [body["query"]] + noise["filter"],
+                    "must_not": noise["must_not"]
+                }
+            }
+
+        if self.source_fields:
+            body["_source"] = {"includes": list(self.source_fields)}
+
+        return body
+
+
+PROFILES = {
+    # everything the indexer holds, byte-for-byte (today's behaviour)
+    "full": CollectionProfile("full"),
+
+    # noise filtered server-side, full alert bodies kept as evidence
+    "filtered": CollectionProfile("filtered", noise_pushdown=True),
+
+    # noise filtered server-side and _source projected to normalizer fields
+    "signal": CollectionProfile(
+        "signal",
+        noise_pushdown=True,
+        source_fields=NORMALIZER_FIELDS
+    )
+}
+
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(
+            f"Unknown collection profile '{name}', expected one of {sorted(PROFILES)}"
+        )
+    return PROFILES[name]
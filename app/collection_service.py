@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from app.database import SessionLocal
+from app.evidence_writer import EvidenceWriter, chain_write_lock
+from app.collector_pipeline import CollectorPipeline
+from app.multi_collector import MultiSourceCollector
+from app.collection_sources import get_source_cursor
+
+DEFAULT_INTERVAL = 30.0
+JOB_HISTORY = 20
+
+RUNNING_STATES = {"queued", "waiting_for_writer", "collecting", "sleeping", "stopping"}
+
+
+class CollectionJob:
+    def __init__(self, tail, interval):
+        self.job_id = str(uuid.uuid4())
+        self.tail = tail
+        self.interval = interval
+        self.state = "queued"
+        self.error = None
+
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+
+        self.cycles = 0
+        self.stored = 0
+        self.lagging = False
+        self.last_cycle = None
+
+        self.stop_requested = threading.Event()
+        self.lock = threading.Lock()
+
+    def set_state(self, state):
+        # a requested stop stays visible until the job has actually ended
+        if not self.stop_requested.is_set():
+            self.state = state
+
+    def record(self, rows):
+        with self.lock:
+            self.stored += len(rows)
+
+    def running(self):
+        return self.state in RUNNING_STATES
+
+    def status(self):
+        with self.lock:
+            end = self.finished_at or datetime.utcnow()
+            elapsed = (end - self.started_at).total_seconds() if self.started_at else 0.0
+
+            return {
+                "job_id": self.job_id,
+                "mode": "tail" if self.tail else "once",
+                "interval_seconds": self.interval,
+                "state": self.state,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "cycles": self.cycles,
+                "stored": self.stored,
+                "elapsed_seconds": round(elapsed, 3),
+                "events_per_sec": round(self.stored / elapsed, 1) if elapsed else 0.0,
+                "lagging": self.lagging,
+                "last_cycle": self.last_cycle
+            }
+
+
+class CollectionService:
+    """
+    Runs collection in the background, one job at a time.
+
+    A job is either a single catch-up pass or continuous tailing that
+    repeats the pass every `interval` seconds. Every pass holds the chain
+    write lock, so it can never interleave with another writer and fork the
+    hash chain. Within a pass the pipeline's bounded queues hold the fetcher
+    back when the writer is slower; across passes, a pass that overruns the
+    interval is followed immediately by the next one instead of piling up.
+    """
+
+    def __init__(self, sources, dedup=None, on_commit=None):
+        self.sources = sources
+        self.dedup = dedup
+        self.on_commit = on_commit
+        self.jobs = OrderedDict()
+        self.current = None
+        self.lock = threading.Lock()
+
+    def start(self, tail=False, interval=None):
+        if interval is None:
+            interval = float(os.getenv("COLLECT_INTERVAL_SECONDS", DEFAULT_INTERVAL))
+
+        with self.lock:
+            if self.current and self.current.running():
+                return self.current, False
+
+            job = CollectionJob(tail, interval)
+            self.jobs[job.job_id] = job
+            while len(self.jobs) > JOB_HISTORY:
+                self.jobs.popitem(last=False)
+            self.current = job
+
+        threading.Thread(target=self.run, args=(job,), name="collector", daemon=True).start()
+        return job, True
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def stop(self, job_id):
+        job = self.jobs.get(job_id)
+        if job and job.running():
+            job.state = "stopping"
+            job.stop_requested.set()
+        return job
+
+    def run(self, job):
+        job.started_at = datetime.utcnow()
+
+        try:
+            while not job.stop_requested.is_set():
+                started = time.perf_counter()
+                try:
+                    job.last_cycle = self.cycle(job)
+                    job.error = None
+                except Exception as e:
+                    if not job.tail:
+                        raise
+                    # a tailing job retries on the next pass from the stored cursors
+                    job.error = str(e)
+                job.cycles += 1
+
+                if not job.tail:
+                    break
+
+                elapsed = time.perf_counter() - started
+                job.lagging = elapsed >= job.interval
+                if not job.lagging:
+                    job.set_state("sleeping")
+                    job.stop_requested.wait(job.interval - elapsed)
+
+            job.state = "stopped" if job.stop_requested.is_set() else "finished"
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    def cycle(self, job):
+        job.set_state("waiting_for_writer")
+
+        with chain_write_lock:
+            job.set_state("collecting")
+            session = SessionLocal()
+
+            def committed(rows):
+                job.record(rows)
+                if self.on_commit:
+                    self.on_commit(rows)
+
+            try:
+                writer = EvidenceWriter(session, dedup=self.dedup, on_commit=committed)
+
+                if len(self.sources) == 1:
+                    source = self.sources[0]
+                    last_ts, last_id = get_source_cursor(session, source.name)
+                    return CollectorPipeline(source, writer).run(last_ts, last_id)
+
+                return MultiSourceCollector(self.sources, writer).run()
+            finally:
+                session.close()
@@ -0,0 +1,92 @@
+import json
+import os
+
+from app.models import EvidenceEvent, CollectionCursor
+from app.wazuh_client import WazuhClient
+from app.collection_profile import get_profile
+
+DEFAULT_SOURCE = "default"
+DEFAULT_INDICES = "wazuh-alerts-*"
+EPOCH = "1970-01-01T00:00:00Z"
+
+
+class CollectionSource:
+    def __init__(self, name, client, indices=DEFAULT_INDICES):
+        self.name = name
+        self.client = client
+        self.indices = indices
+
+    def pages(self, since_ts, since_id=None, size=500):
+        return self.client.iter_pages(since_ts, since_id, size=size, indices=self.indices)
+
+
+def load_sources():
+    """
+    WAZUH_SOURCES is a JSON list of indexers to collect from, e.g.
+
+        [{"name": "eu", "url": "https://eu:9200", "user": "...",
+          "password": "...", "indices": "wazuh-alerts-*", "profile": "full"}]
+
+    Without it, the single WAZUH_URL indexer is collected as "default".
+    """
+    default_profile = os.getenv("WAZUH_COLLECTION_PROFILE", "full")
+    raw = os.getenv("WAZUH_SOURCES")
+
+    if raw:
+        specs = json.loads(raw)
+    else:
+        specs = [{
+            "name": DEFAULT_SOURCE,
+            "url": os.getenv("WAZUH_URL"),
+            "user": os.getenv("WAZUH_USER"),
+            "password": os.getenv("WAZUH_PASS")
+        }]
+
+    names = [spec["name"] for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError("WAZUH_SOURCES entries must have unique names")
+
+    return [
+        CollectionSource(
+            name=spec["name"],
+            client=WazuhClient(
+                base_url=spec["url"],
+                username=spec.get("user"),
+                password=spec.get("password"),
+                verify_ssl=spec.get("verify_ssl", False),
+                profile=get_profile(spec.get("profile", default_profile))
+            ),
+            indices=spec.get("indices", DEFAULT_INDICES)
+        )
+        for spec in specs
+    ]
+
+
+def get_last_cursor(session):
+    ev = session.query(EvidenceEvent)\
+        .order_by(EvidenceEvent.wazuh_timestamp.desc(),
+                  EvidenceEvent.wazuh_id.desc())\
+        .first()
+
+    if not ev:
+        return EPOCH, None
+
+    return ev.wazuh_timestamp, ev.wazuh_id
+
+
+def get_source_cursor(session, source):
+    cursor = session.get(CollectionCursor, source)
+    if cursor:
+        return cursor.last_ts, cursor.last_id
+
+    # Evidence collected before per-source cursors existed all came from the
+    # single WAZUH_URL indexer, so only the default source inherits it.
+    if source == DEFAULT_SOURCE:
+        return get_last_cursor(session)
+
+    return EPOCH, None
+
+
+def page_cursor(hits):
+    last = hits[-1]
+    return last["_source"]["@timestamp"], last["_id"]
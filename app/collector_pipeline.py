@@ -0,0 +1,181 @@
+import queue
+import threading
+import time
+
+from app.evidence_writer import prepare_page
+from app.collection_sources import page_cursor
+
+PAGE_SIZE = 500
+NORMALIZE_WORKERS = 2
+QUEUE_DEPTH = 4
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.pages = 0
+        self.events = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, events, started):
+        with self.lock:
+            self.pages += 1
+            self.events += events
+            self.busy += time.perf_counter() - started
+
+    def report(self, wall):
+        return {
+            "pages": self.pages,
+            "events": self.events,
+            "busy_seconds": round(self.busy, 3),
+            "utilization": round(self.busy / wall, 3) if wall else 0.0,
+            "events_per_sec": round(self.events / self.busy, 1) if self.busy else 0.0
+        }
+
+
+class CollectorPipeline:
+    """
+    fetch -> normalize (N workers) -> ordered write
+
+    Pages carry a sequence number so the single writer can extend the hash
+    chain in exactly the order the indexer returned them, whatever order the
+    normalize workers finish in. Bounded queues provide the backpressure.
+    On failure every stage stops working but keeps draining its input until
+    the end markers arrive, so shutdown never deadlocks.
+    """
+
+    def __init__(self, source, writer, page_size=PAGE_SIZE,
+                 workers=NORMALIZE_WORKERS, depth=QUEUE_DEPTH):
+        self.source = source
+        self.writer = writer
+        self.page_size = page_size
+        self.workers = workers
+
+        self.fetched = queue.Queue(maxsize=depth)
+        self.prepared = queue.Queue(maxsize=depth)
+        self.stop = threading.Event()
+        self.errors = []
+
+        self.stats = {
+            "fetch": StageStats("fetch"),
+            "normalize": StageStats("normalize"),
+            "write": StageStats("write")
+        }
+
+    # --- stages ---
+
+    def fetch_stage(self, since_ts, since_id):
+        pages = None
+        try:
+            pages = self.source.pages(since_ts, since_id, size=self.page_size)
+            seq = 0
+
+            while not self.stop.is_set():
+                started = time.perf_counter()
+                hits = next(pages, None)
+                if hits is None:
+                    break
+                self.stats["fetch"].record(len(hits), started)
+
+                self.fetched.put((seq, hits, page_cursor(hits)))
+                seq += 1
+        except Exception as e:
+            self.fail(e)
+        finally:
+            if pages is not None:
+                # releases the indexer-side point-in-time on early stop
+                pages.close()
+            for _ in range(self.workers):
+                self.fetched.put(_DONE)
+
+    def normalize_stage(self):
+        try:
+            while True:
+                item = self.fetched.get()
+                if item is _DONE:
+                    break
+                if self.stop.is_set():
+                    continue
+
+                seq, hits, cursor = item
+                started = time.perf_counter()
+                events = prepare_page(hits)
+                self.stats["normalize"].record(len(events), started)
+
+                self.prepared.put((seq, events, cursor))
+        except Exception as e:
+            self.fail(e)
+            self.drain(self.fetched)
+        finally:
+            self.prepared.put(_DONE)
+
+    def write_stage(self):
+        pending = {}
+        expected = 0
+        finished = 0
+
+        while finished < self.workers:
+            item = self.prepared.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            if self.stop.is_set():
+                continue
+
+            seq, events, cursor = item
+            pending[seq] = (events, cursor)
+
+            while expected in pending:
+                events, cursor = pending.pop(expected)
+                started = time.perf_counter()
+                try:
+                    self.writer.write_page(events, cursors={self.source.name: cursor})
+                except Exception as e:
+                    self.fail(e)
+                    break
+                self.stats["write"].record(len(events), started)
+                expected += 1
+
+    # --- plumbing ---
+
+    def drain(self, q):
+        # after a failure, keep consuming until the upstream end marker so
+        # no stage is left blocked on a full queue
+        while q.get() is not _DONE:
+            pass
+
+    def fail(self, error):
+        self.errors.append(error)
+        self.stop.set()
+
+    def run(self, since_ts, since_id=None):
+        started = time.perf_counter()
+
+        threads = [threading.Thread(
+            target=self.fetch_stage, args=(since_ts, since_id), daemon=True
+        )]
+        threads += [
+            threading.Thread(target=self.normalize_stage, daemon=True)
+            for _ in range(self.workers)
+        ]
+
+        for t in threads:
+            t.start()
+
+        self.write_stage()
+
+        for t in threads:
+            t.join()
+
+        if self.errors:
+            raise self.errors[0]
+
+        wall = time.perf_counter() - started
+        return {
+            "stored": self.writer.stored,
+            "elapsed_seconds": round(wall, 3),
+            "stages": {name: s.report(wall) for name, s in self.stats.items()}
+        }
@@ -1,11 +1,127 @@
-from sqlalchemy import create_engine
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker
-from app.models import Base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.models import Base, EvidenceEvent
 
 DATABASE_URL = "sqlite:///./knighteye.db"
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# WAL lets readers run alongside the one writer instead of queueing behind
+# it; NORMAL sync is durable across application crashes in WAL mode.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 30_000,
+    "cache_size": -64_000,
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024
+}
+
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+
+
+def sqlite_pragmas(read_only):
+    def apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return apply
+
 
+# Writes (collection, incident engine, materialized views, watermarks).
+# The chain itself has a single writer at a time, see chain_write_lock.
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+event.listen(engine, "connect", sqlite_pragmas(read_only=False))
 SessionLocal = sessionmaker(bind=engine)
 
+# Reads (verification, proofs, listings) from their own pool, so long scans
+# never hold a writer connection.
+read_engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=READ_POOL_SIZE,
+    max_overflow=0
+)
+event.listen(read_engine, "connect", sqlite_pragmas(read_only=True))
+ReadSession = sessionmaker(bind=read_engine)
+
+async_read_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=READ_POOL_SIZE, max_overflow=0)
+event.listen(async_read_engine.sync_engine, "connect", sqlite_pragmas(read_only=True))
+AsyncReadSession = async_sessionmaker(async_read_engine, expire_on_commit=False)
+
+
+@contextmanager
+def session_scope(factory=SessionLocal):
+    session = factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+async def run_read(fn, *args, **kwargs):
+    # Runs sync ORM code (fn(session, ...)) on an async read session, so
+    # light lookups are awaited on the event loop without a worker thread.
+    async with AsyncReadSession() as session:
+        return await session.run_sync(fn, *args, **kwargs)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+    backfill_chain_seq()
+
+
+def upgrade_schema():
+    # create_all() only creates missing tables; columns and indexes added to
+    # existing tables after the fact have to be applied by hand.
+    inspector = inspect(engine)
+
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                ))
+
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def backfill_chain_seq():
+    # Rows written before chain_seq existed are numbered in the order the
+    # verifier has always walked them: (timestamp, event_id).
+    session = SessionLocal()
+    try:
+        pending = session.query(EvidenceEvent.event_id)\
+            .filter(EvidenceEvent.chain_seq.is_(None))\
+            .order_by(EvidenceEvent.timestamp, EvidenceEvent.event_id)\
+            .all()
+
+        if not pending:
+            return
+
+        start = session.query(EvidenceEvent.chain_seq)\
+            .filter(EvidenceEvent.chain_seq.isnot(None))\
+            .order_by(EvidenceEvent.chain_seq.desc())\
+            .limit(1)\
+            .scalar()
+        start = -1 if start is None else start
+
+        session.bulk_update_mappings(EvidenceEvent, [
+            {"event_id": event_id, "chain_seq": start + 1 + idx}
+            for idx, (event_id,) in enumerate(pending)
+        ])
+        session.commit()
+    finally:
+        session.close()
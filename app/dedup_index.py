@@ -0,0 +1,148 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+from app.models import EvidenceEvent
+from app.evidence_writer import existing_wazuh_ids
+
+# Memory budget: ~HOT_SET_SIZE recent ids plus a fixed-size Bloom filter.
+# 8 MiB of filter keeps false positives around 1% up to ~7M stored ids.
+HOT_SET_SIZE = 200_000
+BLOOM_BYTES = 8 * 1024 * 1024
+BLOOM_HASHES = 7
+WARM_BATCH = 10_000
+
+
+class BloomFilter:
+    def __init__(self, size_bytes=BLOOM_BYTES, hashes=BLOOM_HASHES):
+        self.bits = size_bytes * 8
+        self.hashes = hashes
+        self.array = bytearray(size_bytes)
+        self.count = 0
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for p in self.positions(key):
+            self.array[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.array[p >> 3] & (1 << (p & 7)) for p in self.positions(key))
+
+    def false_positive_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+
+class DedupIndex:
+    """
+    Answers "has this wazuh_id already been stored?" for a whole page in memory.
+
+    - in the hot set (recently stored ids): duplicate, no query
+    - not in the Bloom filter: new, no query
+    - Bloom positive outside the hot set: confirmed with one batched query
+
+    The Bloom filter covers every stored id, so the database is only consulted
+    for old duplicates and the filter's false positives. It is filled from
+    evidence_events on the first lookup, so processes that never dedup never
+    load it.
+    """
+
+    def __init__(self, hot_size=HOT_SET_SIZE, bloom_bytes=BLOOM_BYTES, bloom_hashes=BLOOM_HASHES):
+        self.hot_size = hot_size
+        self.hot = OrderedDict()
+        self.bloom = BloomFilter(bloom_bytes, bloom_hashes)
+        self.lock = threading.Lock()
+        self.warmed = False
+
+        self.counters = {
+            "lookups": 0,
+            "hot_hits": 0,
+            "bloom_negatives": 0,
+            "db_checks": 0,
+            "db_hits": 0,
+            "false_positives": 0
+        }
+
+    def warm(self, session):
+        # Reads stored ids WARM_BATCH rows at a time. Walking the chain in
+        # order leaves the tail of evidence_events in the hot set once older
+        # ids have been evicted.
+        with self.lock:
+            if self.warmed:
+                return
+
+            last_seq = -1
+            while True:
+                rows = session.query(EvidenceEvent.chain_seq, EvidenceEvent.wazuh_id)\
+                    .filter(EvidenceEvent.chain_seq > last_seq, EvidenceEvent.wazuh_id.isnot(None))\
+                    .order_by(EvidenceEvent.chain_seq)\
+                    .limit(WARM_BATCH)\
+                    .all()
+                if not rows:
+                    break
+
+                for _, wazuh_id in rows:
+                    self.bloom.add(wazuh_id)
+                    self.remember(wazuh_id)
+                last_seq = rows[-1].chain_seq
+
+            self.warmed = True
+
+    def remember(self, wazuh_id):
+        self.hot[wazuh_id] = None
+        self.hot.move_to_end(wazuh_id)
+        if len(self.hot) > self.hot_size:
+            self.hot.popitem(last=False)
+
+    def add_many(self, wazuh_ids):
+        with self.lock:
+            for wazuh_id in wazuh_ids:
+                if wazuh_id:
+                    self.bloom.add(wazuh_id)
+                    self.remember(wazuh_id)
+
+    def find_existing(self, session, wazuh_ids):
+        if not self.warmed:
+            self.warm(session)
+
+        known = set()
+        maybe = []
+
+        with self.lock:
+            for wazuh_id in wazuh_ids:
+                self.counters["lookups"] += 1
+                if wazuh_id in self.hot:
+                    self.counters["hot_hits"] += 1
+                    known.add(wazuh_id)
+                elif wazuh_id not in self.bloom:
+                    self.counters["bloom_negatives"] += 1
+                else:
+                    maybe.append(wazuh_id)
+
+        if maybe:
+            found = existing_wazuh_ids(session, maybe)
+            with self.lock:
+                self.counters["db_checks"] += len(maybe)
+                self.counters["db_hits"] += len(found)
+                self.counters["false_positives"] += len(maybe) - len(found)
+            known |= found
+
+        return known
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.counters,
+                "warmed": self.warmed,
+                "hot_size": len(self.hot),
+                "hot_capacity": self.hot_size,
+                "bloom_bytes": len(self.bloom.array),
+                "bloom_entries": self.bloom.count,
+                "bloom_false_positive_rate": round(self.bloom.false_positive_rate(), 6)
+            }
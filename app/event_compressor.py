@@ -1,45 +1,65 @@
+from collections import OrderedDict
 from datetime import timedelta
 from app.incident_builder import infer_stage_from_model
+from app.rule_table import active_rules
 
 COMPRESSION_WINDOW = timedelta(seconds=2)
 IMPORTANT_THRESHOLD = 5
 
 
+def pattern_key(ev, stage, label):
+    # filesystem churn groups per file regardless of who touched it
+    if "syscheck" in (ev.target or "").lower():
+        return ("syscheck", ev.system, ev.target, stage)
+
+    return ("event", ev.system, ev.actor, label, ev.target, stage)
+
+
 def compress_events(events):
+    """
+    Groups events that share a pattern and arrive within COMPRESSION_WINDOW
+    of the previous event of that group.
+
+    Every pattern has its own open group, so interleaved bursts (syscheck on
+    one host, logon failures on another) each compress into one block
+    instead of breaking each other's runs. Groups idle for longer than the
+    window are closed as the stream moves on, which keeps the open table
+    small and the pass linear. Blocks come out in the order of their first
+    event.
+    """
     if not events:
         return []
 
-    compressed = []
-    buffer = [events[0]]
-
-    for current in events[1:]:
-        last = buffer[-1]
-
-        if "syscheck" in (current.target or "").lower():
-            same_pattern = (
-                current.system == last.system and
-                current.target == last.target and
-                infer_stage_from_model(current) == infer_stage_from_model(last)
-            )
+    # key -> (first position, events, stage, label), least recently extended first
+    open_groups = OrderedDict()
+    closed = []
+
+    for position, ev in enumerate(events):
+        now = ev.timestamp
+
+        while open_groups:
+            key, group = next(iter(open_groups.items()))
+            if now - group[1][-1].timestamp <= COMPRESSION_WINDOW:
+                break
+            del open_groups[key]
+            closed.append(group)
+
+        # classified once per event; the group keeps its first event's result
+        stage = infer_stage_from_model(ev)
+        label = semantic_label(ev)
+        key = pattern_key(ev, stage, label)
+        group = open_groups.get(key)
+
+        if group:
+            group[1].append(ev)
+            open_groups.move_to_end(key)
         else:
-            same_pattern = (
-                current.system == last.system and
-                current.actor == last.actor and
-                semantic_label(current) == semantic_label(last) and
-                current.target == last.target and
-                infer_stage_from_model(current) == infer_stage_from_model(last)
-            )
-
-        close_in_time = (current.timestamp - last.timestamp) <= COMPRESSION_WINDOW
-
-        if same_pattern and close_in_time:
-            buffer.append(current)
-        else:
-            compressed.append(build_compressed(buffer))
-            buffer = [current]
+            open_groups[key] = (position, [ev], stage, label)
+
+    closed.extend(open_groups.values())
+    closed.sort(key=lambda group: group[0])
 
-    if buffer:
-        compressed.append(build_compressed(buffer))
+    compressed = [build_compressed(buffer, stage, label) for _, buffer, stage, label in closed]
 
     # 🔥 INTELLIGENCE FILTER
     important = [e for e in compressed if e["significance"] >= IMPORTANT_THRESHOLD]
@@ -47,7 +67,7 @@ def compress_events(events):
     return important
 
 
-def build_compressed(buffer):
+def build_compressed(buffer, stage=None, label=None):
     first = buffer[0]
     last = buffer[-1]
 
@@ -60,9 +80,9 @@ def build_compressed(buffer):
         "source_ip": first.source_ip,
 
         "actor": first.actor,
-        "action": semantic_label(first),
+        "action": label or semantic_label(first),
         "target": first.target,
-        "stage": infer_stage_from_model(first),
+        "stage": stage or infer_stage_from_model(first),
 
         "count": len(buffer),
         "confidence": (
@@ -77,60 +97,13 @@ def build_compressed(buffer):
 
 
 def significance_score(ev):
-    score = 0
-
-    stage_weight = {
-        "Initial Access": 3,
-        "Execution": 4,
-        "Privilege Escalation": 5,
-        "Persistence": 5,
-        "Network Activity": 2,
-        "Activity": 1
-    }
-    score += stage_weight.get(ev["stage"], 1)
-
-    action = (ev["action"] or "").lower()
-
-    if any(x in action for x in ["account", "user", "group"]):
-        score += 4
-    if any(x in action for x in ["powershell", "script", "command"]):
-        score += 3
-    if any(x in action for x in ["service", "registry", "scheduled task"]):
-        score += 4
-    if any(x in action for x in ["executable", "dll", "payload"]):
-        score += 4
-    if any(x in action for x in ["logon failure", "authentication"]):
-        score += 2
-
-    if ev["count"] > 20:
-        score += 1
-
-    return score
+    rules = active_rules()
+    return rules.significance(ev["stage"], ev["action"], ev["count"] > rules.bulk_count)
 
 
 def semantic_label(ev):
-    action = (ev.action_operation or "").lower()
-    target = (ev.target or "").lower()
-
-    if "new user added" in action or "new group added" in action:
-        return "Account creation / modification"
-
-    if "new windows service created" in action:
-        return "Persistence mechanism established"
-
-    if "powershell" in action:
-        return "Suspicious script execution"
-
-    if "executable file dropped" in action:
-        return "Malware staging activity"
-
-    if "logon failure" in action:
-        return "Authentication failures"
-
-    if "syscheck" in target:
-        return "Mass filesystem changes"
+    return label_for(ev.action_operation, ev.target)
 
-    if "firewall" in action or "pfsense" in action:
-        return "Blocked network activity"
 
-    return ev.action_operation
+def label_for(action_operation, target):
+    return active_rules().label(action_operation, target)
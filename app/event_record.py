@@ -0,0 +1,83 @@
+from app.models import EvidenceEvent
+
+STREAM_BATCH = 5_000
+# distinct column values remembered per stream for sharing
+SHARED_VALUES = 100_000
+
+# The columns the reconstruction engines (incident clustering, noise
+# filtering, compression, storylines) read. Hashes, raw payloads and
+# forensic linkage stay in the database.
+RECORD_FIELDS = (
+    "event_id",
+    "chain_seq",
+    "timestamp",
+    "incident_id",
+    "system",
+    "system_type",
+    "source_ip",
+    "actor",
+    "action_category",
+    "action_operation",
+    "target",
+    "severity",
+    "stage",
+    "agent_id"
+)
+
+RECORD_COLUMNS = tuple(getattr(EvidenceEvent, f) for f in RECORD_FIELDS)
+
+
+class EventRecord:
+    """
+    Read-only projection of an evidence row for analytics.
+
+    Attribute-compatible with EvidenceEvent for the fields above, so the
+    engines take either. No identity map, no instance state and no
+    per-instance dict: a fraction of the memory of an ORM instance.
+    """
+
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, event_id, chain_seq, timestamp, incident_id, system, system_type,
+                 source_ip, actor, action_category, action_operation, target, severity, stage,
+                 agent_id):
+        self.event_id = event_id
+        self.chain_seq = chain_seq
+        self.timestamp = timestamp
+        self.incident_id = incident_id
+        self.system = system
+        self.system_type = system_type
+        self.source_ip = source_ip
+        self.actor = actor
+        self.action_category = action_category
+        self.action_operation = action_operation
+        self.target = target
+        self.severity = severity
+        self.stage = stage
+        self.agent_id = agent_id
+
+    def __repr__(self):
+        return f"EventRecord({self.chain_seq}, {self.event_id!r})"
+
+
+def stream_records(session, *criteria, batch=STREAM_BATCH):
+    # Chain order, fetched `batch` rows at a time, so callers can walk
+    # millions of events without holding them all. Everything after the
+    # timestamp repeats heavily (incident, host, actor, rule text), so equal
+    # values share one string object instead of one per row.
+    rows = session.query(*RECORD_COLUMNS)\
+        .filter(*criteria)\
+        .order_by(EvidenceEvent.chain_seq)\
+        .yield_per(batch)
+
+    shared = {}
+    share = shared.setdefault
+
+    for event_id, chain_seq, timestamp, *descriptive in rows:
+        if len(shared) > SHARED_VALUES:
+            shared.clear()
+        yield EventRecord(event_id, chain_seq, timestamp, *[share(v, v) for v in descriptive])
+
+
+def load_records(session, *criteria):
+    return list(stream_records(session, *criteria))
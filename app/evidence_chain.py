@@ -1,12 +1,111 @@
 import hashlib
 import json
+from json.encoder import encode_basestring
+from operator import attrgetter, itemgetter
 
-def compute_hash(prev_hash, event_dict):
-    canonical = json.dumps(
+# Fields that make up the hashed evidence record. Ingestion and verification
+# must agree on this set exactly, otherwise stored chains cannot be re-proven.
+EVIDENCE_FIELDS = (
+    "system",
+    "system_type",
+    "source_ip",
+    "actor",
+    "action_category",
+    "action_operation",
+    "target",
+    "raw_log",
+    "severity",
+    "wazuh_id",
+    "wazuh_index",
+    "wazuh_timestamp",
+    "rule_id",
+    "mitre",
+    "agent_id",
+    "stage"
+)
+
+# --- canonical encoder for the fixed evidence field set ---
+#
+# Produces exactly what json.dumps(sort_keys=True, separators=(",", ":"),
+# ensure_ascii=False) produces for a dict holding these fields, using the
+# same string escaper, but without the generic encoder's per-call setup,
+# key sorting and type dispatch.
+
+CANONICAL_FIELDS = tuple(sorted(EVIDENCE_FIELDS))
+_FIELD_SET = frozenset(EVIDENCE_FIELDS)
+_TEMPLATE = "".join(
+    ("{" if i == 0 else ",") + encode_basestring(field).replace("%", "%%") + ":%s"
+    for i, field in enumerate(CANONICAL_FIELDS)
+) + "}"
+_record_values = attrgetter(*CANONICAL_FIELDS)
+_dict_values = itemgetter(*CANONICAL_FIELDS)
+
+
+def _encode_value(value):
+    if value is None:
+        return "null"
+    if type(value) is str:
+        return encode_basestring(value)
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def canonical_values(values):
+    # values must be in CANONICAL_FIELDS order
+    return _TEMPLATE % tuple([
+        encode_basestring(v) if type(v) is str else _encode_value(v)
+        for v in values
+    ])
+
+
+def canonical_json(event_dict):
+    if len(event_dict) == len(_FIELD_SET) and event_dict.keys() == _FIELD_SET:
+        return canonical_values(_dict_values(event_dict))
+
+    return json.dumps(
         event_dict,
         sort_keys=True,
         separators=(",", ":"),
         ensure_ascii=False
     )
+
+
+def evidence_dict(ev: dict):
+    return {field: ev.get(field) for field in EVIDENCE_FIELDS}
+
+
+def compute_hash(prev_hash, event_dict):
+    canonical = canonical_json(event_dict)
     payload = (prev_hash + canonical).encode("utf-8")
     return hashlib.sha256(payload).hexdigest()
+
+
+def hash_record(prev_hash, record):
+    payload = (prev_hash + canonical_values(_record_values(record))).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def chain_hashes(prev_hash, events):
+    # Hashes a run of normalized event dicts (every evidence field present)
+    # in one call, each linked to the one before it. Returns the
+    # current_hash of every event, in order.
+    sha256 = hashlib.sha256
+    hashes = []
+
+    for ev in events:
+        canonical = canonical_values(_dict_values(ev))
+        prev_hash = sha256((prev_hash + canonical).encode("utf-8")).hexdigest()
+        hashes.append(prev_hash)
+
+    return hashes
+
+
+def chain_record_hashes(prev_hash, records):
+    sha256 = hashlib.sha256
+    hashes = []
+
+    for record in records:
+        canonical = canonical_values(_record_values(record))
+        prev_hash = sha256((prev_hash + canonical).encode("utf-8")).hexdigest()
+        hashes.append(prev_hash)
+
+    return hashes
@@ -0,0 +1,370 @@
+import hashlib
+
+from sqlalchemy.orm import selectinload, undefer
+
+from app.models import EvidenceEvent, EvidenceCheckpoint
+from app.evidence_verifier import verify_incident
+
+# Events per checkpoint block. A power of two keeps every block a perfect
+# Merkle tree, so proofs are exactly log2(BLOCK_SIZE) siblings long.
+BLOCK_SIZE = 1024
+
+GENESIS = "GENESIS"
+
+
+# --- Merkle trees over current_hash values ---
+
+def leaf_hash(current_hash):
+    return hashlib.sha256(b"\x00" + bytes.fromhex(current_hash)).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def merkle_levels(current_hashes):
+    levels = [[leaf_hash(h) for h in current_hashes]]
+
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        # an odd node out is carried up unchanged
+        levels.append([
+            node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ])
+
+    return levels
+
+
+def merkle_root(current_hashes):
+    return merkle_levels(current_hashes)[-1][0].hex()
+
+
+def merkle_proof(levels, index):
+    proof = []
+
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({
+                "side": "left" if sibling < index else "right",
+                "hash": level[sibling].hex()
+            })
+        index //= 2
+
+    return proof
+
+
+def verify_inclusion(current_hash, proof, root):
+    node = leaf_hash(current_hash)
+
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        node = node_hash(sibling, node) if step["side"] == "left" else node_hash(node, sibling)
+
+    return node.hex() == root
+
+
+def checkpoint_digest(prev_checkpoint_hash, block_index, first_seq, last_seq, root):
+    payload = f"{prev_checkpoint_hash}|{block_index}|{first_seq}|{last_seq}|{root}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- checkpoint store ---
+
+def block_bounds(block_index):
+    first = block_index * BLOCK_SIZE
+    return first, first + BLOCK_SIZE - 1
+
+
+def block_of(chain_seq):
+    return chain_seq // BLOCK_SIZE
+
+
+def load_block_rows(session, block_index):
+    first, last = block_bounds(block_index)
+    return session.query(EvidenceEvent)\
+        .options(selectinload(EvidenceEvent.blob), undefer(EvidenceEvent.raw_log_inline))\
+        .filter(EvidenceEvent.chain_seq.between(first, last))\
+        .order_by(EvidenceEvent.chain_seq)\
+        .all()
+
+
+def block_complete(block_index, seqs):
+    # a sealed block holds exactly BLOCK_SIZE rows with consecutive chain_seq;
+    # anything else means rows were removed or inserted after sealing
+    first, last = block_bounds(block_index)
+    return len(seqs) == BLOCK_SIZE and seqs[0] == first and seqs[-1] == last and all(
+        b - a == 1 for a, b in zip(seqs, seqs[1:])
+    )
+
+
+def missing_seqs(block_index, seqs):
+    # [first, last] runs of chain_seq absent from a block
+    first, last = block_bounds(block_index)
+    present = set(seqs)
+    runs = []
+    start = None
+
+    for seq in range(first, last + 1):
+        if seq not in present:
+            if start is None:
+                start = seq
+        elif start is not None:
+            runs.append([start, seq - 1])
+            start = None
+
+    if start is not None:
+        runs.append([start, last])
+    return runs
+
+
+def load_block_hashes(session, block_index):
+    first, last = block_bounds(block_index)
+    rows = session.query(EvidenceEvent.current_hash)\
+        .filter(EvidenceEvent.chain_seq.between(first, last))\
+        .order_by(EvidenceEvent.chain_seq)\
+        .all()
+    return [r.current_hash for r in rows]
+
+
+def latest_checkpoint(session):
+    return session.query(EvidenceCheckpoint)\
+        .order_by(EvidenceCheckpoint.block_index.desc())\
+        .first()
+
+
+def seal_blocks(session):
+    # Adds a checkpoint for every full block that has none yet, without
+    # committing, so a writer can seal in the transaction of its page.
+    head_seq = session.query(EvidenceEvent.chain_seq)\
+        .order_by(EvidenceEvent.chain_seq.desc())\
+        .limit(1)\
+        .scalar()
+
+    if head_seq is None:
+        return 0
+
+    latest = latest_checkpoint(session)
+    block_index = latest.block_index + 1 if latest else 0
+    prev_hash = latest.checkpoint_hash if latest else GENESIS
+    created = 0
+
+    while block_bounds(block_index)[1] <= head_seq:
+        first, last = block_bounds(block_index)
+        root = merkle_root(load_block_hashes(session, block_index))
+        digest = checkpoint_digest(prev_hash, block_index, first, last, root)
+
+        session.add(EvidenceCheckpoint(
+            block_index=block_index,
+            first_seq=first,
+            last_seq=last,
+            merkle_root=root,
+            prev_checkpoint_hash=prev_hash,
+            checkpoint_hash=digest
+        ))
+
+        prev_hash = digest
+        block_index += 1
+        created += 1
+
+    return created
+
+
+def commit_checkpoints(session):
+    # Idempotent, so it can run at startup to catch up.
+    created = seal_blocks(session)
+    if created:
+        session.commit()
+    return created
+
+
+# --- verification ---
+
+def verify_checkpoint_chain(session):
+    prev_hash = GENESIS
+    checked = 0
+
+    for cp in session.query(EvidenceCheckpoint).order_by(EvidenceCheckpoint.block_index):
+        expected = checkpoint_digest(prev_hash, cp.block_index, cp.first_seq, cp.last_seq, cp.merkle_root)
+
+        if cp.block_index != checked or cp.prev_checkpoint_hash != prev_hash or cp.checkpoint_hash != expected:
+            return {
+                "valid": False,
+                "message": "Checkpoint chain integrity violation detected.",
+                "checked_checkpoints": checked + 1,
+                "broken_at": {
+                    "block_index": cp.block_index,
+                    "expected_hash": expected,
+                    "stored_hash": cp.checkpoint_hash
+                }
+            }
+
+        prev_hash = cp.checkpoint_hash
+        checked += 1
+
+    return {
+        "valid": True,
+        "message": "Checkpoint chain verified.",
+        "checked_checkpoints": checked
+    }
+
+
+def predecessor_hash(session, chain_seq):
+    if chain_seq == 0:
+        return GENESIS
+
+    return session.query(EvidenceEvent.current_hash)\
+        .filter(EvidenceEvent.chain_seq == chain_seq - 1)\
+        .scalar()
+
+
+def missing_rows(block_index, checkpoint, seqs):
+    return {
+        "valid": False,
+        "message": "Evidence block does not match its checkpoint.",
+        "checked_events": len(seqs),
+        "broken_at": {
+            "block_index": block_index,
+            "expected_root": checkpoint.merkle_root,
+            "computed_root": None,
+            "stored_events": len(seqs),
+            "missing_seqs": missing_seqs(block_index, seqs)
+        }
+    }
+
+
+def verify_block(session, block_index, rows, checkpoint=None):
+    # a sealed block with rows removed cannot match its root; say which
+    seqs = [r.chain_seq for r in rows]
+    if checkpoint and not block_complete(block_index, seqs):
+        return missing_rows(block_index, checkpoint, seqs)
+
+    result = verify_incident(rows)
+    if not result["valid"]:
+        return result
+
+    # the block must also hang off the real end of the block before it
+    anchor = predecessor_hash(session, rows[0].chain_seq)
+    if rows[0].prev_hash != anchor:
+        return {
+            "valid": False,
+            "message": "Evidence chain integrity violation detected.",
+            "checked_events": 1,
+            "broken_at": {
+                "position": 0,
+                "event_id": rows[0].event_id,
+                "expected_prev_hash": anchor,
+                "stored_prev_hash": rows[0].prev_hash
+            }
+        }
+
+    if checkpoint:
+        root = merkle_root([r.current_hash for r in rows])
+        if root != checkpoint.merkle_root:
+            return {
+                "valid": False,
+                "message": "Evidence block does not match its checkpoint.",
+                "checked_events": len(rows),
+                "broken_at": {
+                    "block_index": block_index,
+                    "expected_root": checkpoint.merkle_root,
+                    "computed_root": root,
+                    "stored_events": len(rows)
+                }
+            }
+
+    return result
+
+
+def verify_range(session, first_seq, last_seq):
+    chain = verify_checkpoint_chain(session)
+    if not chain["valid"]:
+        return chain
+
+    checkpoints = {
+        cp.block_index: cp
+        for cp in session.query(EvidenceCheckpoint).filter(
+            EvidenceCheckpoint.block_index.between(block_of(first_seq), block_of(last_seq))
+        )
+    }
+
+    checked_events = 0
+    checked_blocks = 0
+
+    for block_index in range(block_of(first_seq), block_of(last_seq) + 1):
+        rows = load_block_rows(session, block_index)
+        if not rows and block_index not in checkpoints:
+            # the open tail past the last sealed block
+            break
+
+        result = verify_block(session, block_index, rows, checkpoints.get(block_index))
+        if not result["valid"]:
+            if "position" in result.get("broken_at", {}):
+                result["broken_at"]["chain_seq"] = rows[result["broken_at"]["position"]].chain_seq
+            result["checked_events"] += checked_events
+            return result
+
+        checked_events += len(rows)
+        checked_blocks += 1
+
+    return {
+        "valid": True,
+        "message": "Evidence range verified against its checkpoints.",
+        "first_seq": first_seq,
+        "last_seq": last_seq,
+        "checked_blocks": checked_blocks,
+        "checked_events": checked_events,
+        "checked_checkpoints": chain["checked_checkpoints"]
+    }
+
+
+def inclusion_proof(session, event_id):
+    ev = session.get(EvidenceEvent, event_id)
+    if not ev or ev.chain_seq is None:
+        return None
+
+    block_index = block_of(ev.chain_seq)
+    checkpoint = session.get(EvidenceCheckpoint, block_index)
+    if not checkpoint:
+        return {
+            "event_id": event_id,
+            "chain_seq": ev.chain_seq,
+            "block_index": block_index,
+            "sealed": False,
+            "message": "Event is in the open tail block; no checkpoint covers it yet."
+        }
+
+    rows = session.query(EvidenceEvent.chain_seq, EvidenceEvent.current_hash)\
+        .filter(EvidenceEvent.chain_seq.between(checkpoint.first_seq, checkpoint.last_seq))\
+        .order_by(EvidenceEvent.chain_seq)\
+        .all()
+
+    if not block_complete(block_index, [r.chain_seq for r in rows]):
+        return {
+            "event_id": event_id,
+            "chain_seq": ev.chain_seq,
+            "current_hash": ev.current_hash,
+            "block_index": block_index,
+            "sealed": True,
+            "merkle_root": checkpoint.merkle_root,
+            "checkpoint_hash": checkpoint.checkpoint_hash,
+            "verified": False,
+            "message": "Evidence block does not match its checkpoint."
+        }
+
+    levels = merkle_levels([r.current_hash for r in rows])
+    position = ev.chain_seq - checkpoint.first_seq
+    proof = merkle_proof(levels, position)
+
+    return {
+        "event_id": event_id,
+        "chain_seq": ev.chain_seq,
+        "current_hash": ev.current_hash,
+        "block_index": block_index,
+        "sealed": True,
+        "proof": proof,
+        "merkle_root": checkpoint.merkle_root,
+        "checkpoint_hash": checkpoint.checkpoint_hash,
+        "verified": verify_inclusion(ev.current_hash, proof, checkpoint.merkle_root)
+    }
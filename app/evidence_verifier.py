@@ -1,4 +1,52 @@
-from app.evidence_chain import compute_hash
+import hashlib
+import os
+from collections import deque
+from itertools import chain
+
+from sqlalchemy import func, select
+
+from app.database import read_engine
+from app.models import EvidenceEvent, EvidenceBlob, VerificationWatermark
+from app.evidence_chain import hash_record, canonical_values, CANONICAL_FIELDS
+from app.blob_store import blob_text
+from app.process_pool import worker_pool
+
+SEGMENT_SIZE = 50_000
+STREAM_BATCH = 10_000
+IN_FLIGHT_PER_WORKER = 2
+# Ranges up to about two checkpoint blocks are verified in this process;
+# starting worker processes would cost more than the hashing.
+INLINE_ROWS = 2_048
+
+# event_id, current_hash, then the evidence fields in canonical order, with
+# the blob columns last so raw_log can be restored to the text that was hashed
+SEGMENT_COLUMNS = (
+    EvidenceEvent.event_id,
+    EvidenceEvent.current_hash,
+    *(EvidenceEvent.raw_log_inline if f == "raw_log" else getattr(EvidenceEvent, f)
+      for f in CANONICAL_FIELDS),
+    EvidenceEvent.raw_ref,
+    EvidenceBlob.codec,
+    EvidenceBlob.data
+)
+RAW_LOG_POSITION = 2 + CANONICAL_FIELDS.index("raw_log")
+BLOB_JOIN = (EvidenceBlob, EvidenceBlob.digest == EvidenceEvent.raw_ref)
+
+
+def segment_row(row):
+    # (event_id, current_hash, *canonical values) from a SEGMENT_COLUMNS row
+    values = tuple(row[:-3])
+    raw_ref, codec, data = row[-3:]
+
+    if raw_ref is not None:
+        values = (
+            values[:RAW_LOG_POSITION]
+            + (blob_text(raw_ref, codec, data),)
+            + values[RAW_LOG_POSITION + 1:]
+        )
+
+    return values
+
 
 def verify_incident(events):
     if not events:
@@ -11,26 +59,7 @@ def verify_incident(events):
     prev_hash = events[0].prev_hash
 
     for idx, ev in enumerate(events):
-        event_dict = {
-            "system": ev.system,
-            "system_type": ev.system_type,
-            "source_ip": ev.source_ip,
-            "actor": ev.actor,
-            "action_category": ev.action_category,
-            "action_operation": ev.action_operation,
-            "target": ev.target,
-            "raw_log": ev.raw_log,
-            "severity": ev.severity,
-            "wazuh_id": ev.wazuh_id,
-            "wazuh_index": ev.wazuh_index,
-            "wazuh_timestamp": ev.wazuh_timestamp,
-            "rule_id": ev.rule_id,
-            "mitre": ev.mitre,
-            "agent_id": ev.agent_id,
-            "stage": ev.stage
-        }
-
-        expected = compute_hash(prev_hash, event_dict)
+        expected = hash_record(prev_hash, ev)
 
         if expected != ev.current_hash:
             return {
@@ -52,3 +81,367 @@ def verify_incident(events):
         "message": "Evidence chain verified. No tampering detected.",
         "checked_events": len(events)
     }
+
+
+# --- segment-parallel verification ---
+#
+# Each link is checked against the *stored* current_hash of the row before
+# it, so a segment only needs that one hash as its anchor to be verified on
+# its own. Checking segments independently and taking the earliest break
+# gives exactly the same answer as the sequential walk above.
+
+def verify_segment(anchor, rows):
+    sha256 = hashlib.sha256
+    prev_hash = anchor
+
+    for idx, row in enumerate(rows):
+        current_hash = row[1]
+        expected = sha256((prev_hash + canonical_values(row[2:])).encode("utf-8")).hexdigest()
+
+        if expected != current_hash:
+            return idx, expected
+
+        prev_hash = current_hash
+
+    return None
+
+
+def reset_worker_engine():
+    # workers must never share the parent's SQLite connections
+    read_engine.dispose(close=False)
+
+
+def verify_seq_range(first_seq, last_seq):
+    # Runs in a worker process: reads its own slice of the chain, anchored
+    # on the stored hash of the row just before it.
+    with read_engine.connect() as conn:
+        before = conn.execute(
+            select(EvidenceEvent.current_hash)
+            .where(EvidenceEvent.chain_seq < first_seq)
+            .order_by(EvidenceEvent.chain_seq.desc())
+            .limit(1)
+        ).first()
+
+        rows = conn.execute(
+            select(EvidenceEvent.prev_hash, *SEGMENT_COLUMNS)
+            .outerjoin(*BLOB_JOIN)
+            .where(EvidenceEvent.chain_seq.between(first_seq, last_seq))
+            .order_by(EvidenceEvent.chain_seq)
+        ).all()
+
+    if not rows:
+        return 0, None
+
+    anchor = before.current_hash if before else rows[0].prev_hash
+    segment = [segment_row(row[1:]) for row in rows]
+    broken = verify_segment(anchor, segment)
+
+    if broken:
+        idx, expected = broken
+        return idx, (segment[idx][0], expected, segment[idx][1])
+
+    return len(segment), None
+
+
+def iter_segments(rows, segment_size):
+    anchor = None
+    segment = []
+    offset = 0
+
+    for row in rows:
+        if anchor is None:
+            anchor = row.prev_hash
+        segment.append(segment_row(row[1:]))
+
+        if len(segment) >= segment_size:
+            yield offset, anchor, segment
+            offset += len(segment)
+            anchor = segment[-1][1]
+            segment = []
+
+    if segment:
+        yield offset, anchor, segment
+
+
+def broken_result(position, event_id, expected, stored):
+    return {
+        "valid": False,
+        "message": "Evidence chain integrity violation detected.",
+        "checked_events": position + 1,
+        "broken_at": {
+            "position": position,
+            "event_id": event_id,
+            "expected_hash": expected,
+            "stored_hash": stored
+        }
+    }
+
+
+def run_bounded(pool, tasks, window):
+    # Submits tasks lazily, keeping at most `window` in flight, and yields
+    # (task, result) in submission order.
+    tasks = iter(tasks)
+    pending = deque()
+    exhausted = False
+
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                task = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                    break
+                fn, args = task
+                pending.append((args, pool.submit(fn, *args)))
+
+            args, future = pending.popleft()
+            yield args, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def verify_full_chain(session, workers, segment_size, after_seq=None, upto_seq=None):
+    bounds = session.query(
+        func.min(EvidenceEvent.chain_seq),
+        func.max(EvidenceEvent.chain_seq)
+    )
+    if after_seq is not None:
+        bounds = bounds.filter(EvidenceEvent.chain_seq > after_seq)
+    if upto_seq is not None:
+        bounds = bounds.filter(EvidenceEvent.chain_seq <= upto_seq)
+
+    first, last = bounds.one()
+    if first is None:
+        return None
+
+    tasks = (
+        (verify_seq_range, (start, min(start + segment_size - 1, last)))
+        for start in range(first, last + 1, segment_size)
+    )
+
+    if workers == 1 or last - first < INLINE_ROWS:
+        results = ((args, verify_seq_range(*args)) for _, args in tasks)
+        return count_ranges(session, results, after_seq)
+
+    with worker_pool(workers, initializer=reset_worker_engine) as pool:
+        return count_ranges(session, run_bounded(pool, tasks, workers * IN_FLIGHT_PER_WORKER), after_seq)
+
+
+def count_ranges(session, results, after_seq):
+    checked = 0
+
+    for _, (count, broken) in results:
+        if broken:
+            position = checked + count
+            if after_seq is not None:
+                # positions count from the start of the chain, as always
+                position += session.query(EvidenceEvent)\
+                    .filter(EvidenceEvent.chain_seq <= after_seq)\
+                    .count()
+            return broken_result(position, *broken)
+        checked += count
+
+    return checked
+
+
+def verify_streamed(session, criteria, workers, segment_size):
+    rows = session.query(EvidenceEvent.prev_hash, *SEGMENT_COLUMNS)\
+        .outerjoin(*BLOB_JOIN)\
+        .filter(*criteria)\
+        .order_by(EvidenceEvent.chain_seq)\
+        .yield_per(STREAM_BATCH)
+
+    segments = iter_segments(rows, segment_size)
+    first = next(segments, None)
+    if first is None:
+        return None
+
+    second = next(segments, None)
+    segments = chain([first] if second is None else [first, second], segments)
+    tasks = ((verify_segment, (anchor, segment)) for _, anchor, segment in segments)
+    checked = 0
+
+    if second is None or workers == 1:
+        # a single segment is not worth starting a pool for
+        results = ((args, verify_segment(*args)) for _, args in tasks)
+        return settle(results, checked)
+
+    with worker_pool(workers) as pool:
+        return settle(run_bounded(pool, tasks, workers * IN_FLIGHT_PER_WORKER), checked)
+
+
+def settle(results, checked):
+    for (_, segment), broken in results:
+        if broken:
+            idx, expected = broken
+            return broken_result(checked + idx, segment[idx][0], expected, segment[idx][1])
+        checked += len(segment)
+    return checked
+
+
+def verify_chain(session, criteria=(), workers=None, segment_size=SEGMENT_SIZE,
+                 after_seq=None, upto_seq=None):
+    """
+    Verifies the chain (or the subset matching `criteria`) in chain order,
+    segment by segment across a process pool. The result has the same shape
+    and the same first-break position as verify_incident().
+
+    The whole chain is split by chain_seq range and every worker reads its
+    own range, so no single reader bottlenecks the pool. Filtered subsets
+    are streamed from this session and shipped to the workers in segments.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if criteria:
+        outcome = verify_streamed(session, criteria, workers, segment_size)
+    else:
+        outcome = verify_full_chain(session, workers, segment_size, after_seq, upto_seq)
+
+    if outcome is None:
+        return {
+            "valid": True,
+            "message": "No events found for this incident.",
+            "checked_events": 0
+        }
+
+    if isinstance(outcome, dict):
+        return outcome
+
+    return {
+        "valid": True,
+        "message": "Evidence chain verified. No tampering detected.",
+        "checked_events": outcome
+    }
+
+
+# --- incident-scoped verification ---
+
+def verify_incident_events(session, incident_id):
+    """
+    Verifies only the events of one incident, in chain order.
+
+    An incident's events are not contiguous in the chain (noise and other
+    incidents sit in between), so each run of consecutive chain_seq values
+    is walked from the stored prev_hash of its first event, exactly as
+    verify_incident() anchors on events[0].prev_hash. Those anchors are then
+    checked against the real chain predecessors in one batched lookup.
+    """
+    rows = session.query(EvidenceEvent.chain_seq, EvidenceEvent.prev_hash, *SEGMENT_COLUMNS)\
+        .outerjoin(*BLOB_JOIN)\
+        .filter(EvidenceEvent.incident_id == incident_id)\
+        .order_by(EvidenceEvent.chain_seq)\
+        .yield_per(STREAM_BATCH)
+
+    sha256 = hashlib.sha256
+    anchors = []
+    prev_seq = None
+    prev_hash = None
+    count = 0
+
+    for idx, row in enumerate(rows):
+        chain_seq, stored_prev = row[:2]
+        row = segment_row(row[2:])
+        event_id, current_hash = row[:2]
+
+        if prev_seq is None or chain_seq != prev_seq + 1:
+            prev_hash = stored_prev
+            anchors.append((idx, chain_seq, event_id, stored_prev))
+
+        expected = sha256((prev_hash + canonical_values(row[2:])).encode("utf-8")).hexdigest()
+        if expected != current_hash:
+            return broken_result(idx, event_id, expected, current_hash)
+
+        prev_seq = chain_seq
+        prev_hash = current_hash
+        count = idx + 1
+
+    if not count:
+        return {
+            "valid": True,
+            "message": "No events found for this incident.",
+            "checked_events": 0
+        }
+
+    predecessors = {}
+    wanted = [seq - 1 for _, seq, _, _ in anchors if seq > 0]
+    for i in range(0, len(wanted), STREAM_BATCH):
+        predecessors.update(
+            session.query(EvidenceEvent.chain_seq, EvidenceEvent.current_hash)
+            .filter(EvidenceEvent.chain_seq.in_(wanted[i:i + STREAM_BATCH]))
+            .all()
+        )
+
+    for idx, chain_seq, event_id, stored_prev in anchors:
+        linked = predecessors.get(chain_seq - 1, "GENESIS" if chain_seq == 0 else None)
+        if stored_prev != linked:
+            result = broken_result(idx, event_id, linked, stored_prev)
+            result["message"] = "Evidence is not linked to its chain predecessor."
+            result["broken_at"]["expected_prev_hash"] = result["broken_at"].pop("expected_hash")
+            result["broken_at"]["stored_prev_hash"] = result["broken_at"].pop("stored_hash")
+            return result
+
+    return {
+        "valid": True,
+        "message": "Evidence chain verified. No tampering detected.",
+        "checked_events": count
+    }
+
+
+# --- incremental global verification ---
+
+GLOBAL_SCOPE = "global"
+
+
+def verify_incremental(session, full=False, workers=None):
+    """
+    Verifies only what was appended since the last successful run.
+
+    The watermark records the chain_seq and current_hash of the last row
+    proven good. The stored hash at that position is re-checked first; if
+    it no longer matches, the watermark is discarded and the whole chain is
+    verified again. Rewrites strictly below the watermark are caught by a
+    full run or by checkpoint range verification.
+    """
+    head = session.query(EvidenceEvent.chain_seq, EvidenceEvent.current_hash)\
+        .order_by(EvidenceEvent.chain_seq.desc())\
+        .first()
+
+    watermark = session.get(VerificationWatermark, GLOBAL_SCOPE)
+    after_seq = None
+    reset = False
+
+    if watermark and not full:
+        stored = session.query(EvidenceEvent.current_hash)\
+            .filter(EvidenceEvent.chain_seq == watermark.verified_seq)\
+            .scalar()
+        if stored == watermark.verified_hash:
+            after_seq = watermark.verified_seq
+        else:
+            reset = True
+
+    if not head:
+        result = verify_chain(session, workers=workers)
+    elif after_seq is not None and after_seq >= head.chain_seq:
+        result = {
+            "valid": True,
+            "message": "Evidence chain verified. No new evidence since the last verification.",
+            "checked_events": 0
+        }
+    else:
+        result = verify_chain(session, workers=workers, after_seq=after_seq, upto_seq=head.chain_seq)
+
+    if head and result["valid"]:
+        session.merge(VerificationWatermark(
+            scope=GLOBAL_SCOPE,
+            verified_seq=head.chain_seq,
+            verified_hash=head.current_hash
+        ))
+        session.commit()
+
+    result["verified_from_seq"] = after_seq + 1 if after_seq is not None else 0
+    result["verified_upto_seq"] = head.chain_seq if head else None
+    if reset:
+        result["watermark_reset"] = True
+
+    return result
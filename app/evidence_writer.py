@@ -0,0 +1,226 @@
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.exc import IntegrityError
+
+from app.models import EvidenceEvent, CollectionCursor
+from app.normalizer import normalize
+from app.evidence_chain import chain_hashes
+from app.incident_builder import infer_stage_from_dict
+from app.evidence_checkpoints import BLOCK_SIZE, seal_blocks
+from app.blob_store import pack_raw_log, insert_blobs
+
+# SQLite keeps the default bound-parameter limit low on older builds.
+LOOKUP_CHUNK = 500
+
+# Held for the whole of any run that extends the chain. Two writers working
+# from the same head would each link their pages to it and fork the chain.
+chain_write_lock = threading.Lock()
+
+
+def prepare_hit(hit):
+    alert = hit["_source"]
+    alert["_id"] = hit["_id"]
+    alert["_index"] = hit["_index"]
+
+    ev = normalize(alert)
+    ev["stage"] = infer_stage_from_dict(ev)
+    return ev
+
+
+def prepare_page(hits):
+    return [prepare_hit(hit) for hit in hits]
+
+
+def chain_head(session):
+    head = session.query(
+        EvidenceEvent.chain_seq,
+        EvidenceEvent.current_hash,
+        EvidenceEvent.timestamp
+    ).order_by(EvidenceEvent.chain_seq.desc()).first()
+
+    if not head:
+        return -1, "GENESIS", None
+
+    return head.chain_seq, head.current_hash, head.timestamp
+
+
+def existing_wazuh_ids(session, wazuh_ids):
+    wazuh_ids = list(wazuh_ids)
+    found = set()
+
+    for i in range(0, len(wazuh_ids), LOOKUP_CHUNK):
+        chunk = wazuh_ids[i:i + LOOKUP_CHUNK]
+        rows = session.query(EvidenceEvent.wazuh_id)\
+            .filter(EvidenceEvent.wazuh_id.in_(chunk))\
+            .all()
+        found.update(r.wazuh_id for r in rows)
+
+    return found
+
+
+def alert_time(value):
+    # Wazuh stamps alerts like 2026-01-01T10:00:00.123+0000; stored naive UTC
+    try:
+        ts = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+    if ts.tzinfo:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def next_timestamp(last_ts, ts=None):
+    # Evidence timestamps order the chain for incident building, so they
+    # must stay strictly increasing even when a whole page is stamped at
+    # once, and never run ahead of the clock.
+    now = datetime.utcnow()
+    ts = min(ts, now) if ts else now
+    if last_ts and ts <= last_ts:
+        ts = last_ts + timedelta(microseconds=1)
+    return ts
+
+
+class EvidenceWriter:
+    """
+    Appends pages of normalized events to the evidence chain.
+
+    Events are stamped with the time they are stored, unless `alert_times`
+    is set (archive backfills): then each keeps its own alert time, as far
+    as the chain allows. Timestamps never go back, so alerts older than the
+    chain head are stamped just after it.
+    """
+
+    def __init__(self, session, session_id=None, dedup=None, on_commit=None, alert_times=False):
+        self.session = session
+        self.session_id = session_id or str(uuid.uuid4())
+        self.dedup = dedup
+        self.on_commit = on_commit
+        self.alert_times = alert_times
+        self.stored = 0
+        self.reload_head()
+
+    def reload_head(self):
+        self.seq, self.prev_hash, self.last_ts = chain_head(self.session)
+
+    def filter_new(self, events):
+        ids = {ev["wazuh_id"] for ev in events if ev["wazuh_id"]}
+
+        if not ids:
+            known = set()
+        elif self.dedup:
+            known = self.dedup.find_existing(self.session, ids)
+        else:
+            known = existing_wazuh_ids(self.session, ids)
+
+        fresh = []
+        for ev in events:
+            wazuh_id = ev["wazuh_id"]
+            if wazuh_id:
+                if wazuh_id in known:
+                    continue
+                known.add(wazuh_id)
+            fresh.append(ev)
+
+        return fresh
+
+    def write_page(self, events, cursors=None):
+        fresh = self.filter_new(events)
+        if not fresh and not cursors:
+            return []
+
+        try:
+            return self.insert_page(fresh, cursors)
+        except IntegrityError:
+            # Another process (the archive CLI, a second API worker) extended
+            # the chain or stored some of these ids, which this process's
+            # dedup index cannot know. The head is reloaded on rollback;
+            # confirm the ids against the table and retry once.
+            stored = existing_wazuh_ids(self.session, {ev["wazuh_id"] for ev in fresh if ev["wazuh_id"]})
+            if self.dedup:
+                self.dedup.add_many(stored)
+
+            fresh = [ev for ev in fresh if ev["wazuh_id"] not in stored]
+            if not fresh and not cursors:
+                return []
+            return self.insert_page(fresh, cursors)
+
+    def insert_page(self, fresh, cursors):
+        seq, prev_hash, last_ts = self.seq, self.prev_hash, self.last_ts
+        hashes = chain_hashes(prev_hash, fresh)
+        blobs = {}
+        rows = []
+
+        for ev, current_hash in zip(fresh, hashes):
+            seq += 1
+            ts = alert_time(ev["wazuh_timestamp"]) if self.alert_times else None
+            last_ts = next_timestamp(last_ts, ts)
+
+            rows.append({
+                "event_id": str(uuid.uuid4()),
+                "timestamp": last_ts,
+
+                "system": ev["system"],
+                "system_type": ev["system_type"],
+                "source_ip": ev["source_ip"],
+
+                "actor": ev["actor"],
+                "action_category": ev["action_category"],
+                "action_operation": ev["action_operation"],
+
+                "target": ev["target"],
+                "raw_ref": pack_raw_log(ev["raw_log"], blobs),
+                "severity": ev["severity"],
+
+                "prev_hash": prev_hash,
+                "current_hash": current_hash,
+                "chain_seq": seq,
+
+                "session_id": self.session_id,
+                "incident_id": None,
+
+                # forensic linkage
+                "wazuh_id": ev["wazuh_id"],
+                "wazuh_index": ev["wazuh_index"],
+                "wazuh_timestamp": ev["wazuh_timestamp"],
+                "rule_id": ev["rule_id"],
+                "mitre": ev["mitre"],
+                "agent_id": ev["agent_id"],
+                "stage": ev["stage"]
+            })
+
+            prev_hash = current_hash
+
+        # One transaction per page: either the whole page extends the chain
+        # (together with the collection cursors that produced it and the
+        # checkpoints of the blocks it fills) or none of it does, so a crash
+        # always leaves a page boundary.
+        try:
+            insert_blobs(self.session, blobs.values())
+            self.session.bulk_insert_mappings(EvidenceEvent, rows)
+            for source, (cursor_ts, cursor_id) in (cursors or {}).items():
+                self.session.merge(CollectionCursor(
+                    source=source,
+                    last_ts=cursor_ts,
+                    last_id=cursor_id
+                ))
+            if (seq + 1) // BLOCK_SIZE > (self.seq + 1) // BLOCK_SIZE:
+                seal_blocks(self.session)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            self.reload_head()
+            raise
+
+        self.seq, self.prev_hash, self.last_ts = seq, prev_hash, last_ts
+        self.stored += len(rows)
+
+        if self.dedup:
+            self.dedup.add_many(row["wazuh_id"] for row in rows)
+
+        if self.on_commit and rows:
+            self.on_commit(rows)
+
+        return rows
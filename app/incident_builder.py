@@ -2,83 +2,78 @@ from datetime import timedelta
 import uuid
 import os
 from dotenv import load_dotenv
+from app.rule_table import active_rules
+from app.incident_clusters import EntityClusters
 load_dotenv()
 
 INCIDENT_WINDOW = timedelta(minutes=10)
+# a busy, well-connected network would otherwise grow one incident forever
+MAX_INCIDENT_SPAN = timedelta(minutes=int(os.getenv("INCIDENT_MAX_SPAN_MINUTES", 240)))
+
 EXCLUDED_SYSTEMS = {
     os.getenv("WAZUH_SERVER")
 }
 
+# Incident ids are derived from the incident's first event, so rebuilding
+# from the same evidence always yields the same ids.
+INCIDENT_NAMESPACE = uuid.UUID("6f1c3b8e-2d4a-5e7f-9a0b-1c2d3e4f5a6b")
+
 def build_incidents(events):
-    incidents = []
-    current = None
+    """
+    Groups events into incidents by entity connectivity: events sharing a
+    source IP, actor, host or agent within INCIDENT_WINDOW of each other
+    belong together, and no incident spans more than MAX_INCIDENT_SPAN.
+    """
+    clusters = EntityClusters(INCIDENT_WINDOW, MAX_INCIDENT_SPAN, incident_id_for)
+    members = []
 
     for ev in events:
-        
+
         if ev.system in EXCLUDED_SYSTEMS:
             continue
-        
+
         if is_noise(ev):
             continue
 
-        if not current:
-            current = new_incident(ev)
-            continue
+        members.append((clusters.add(ev), ev))
 
-        if ev.timestamp - current["end_time"] <= INCIDENT_WINDOW and not is_noise(ev):
-            current["events"].append(ev)
-            current["end_time"] = ev.timestamp
-            current["systems"].add(ev.system)
-        else:
-            incidents.append(finalize(current))
-            current = new_incident(ev)
+    grouped = {}
+    for cluster, ev in members:
+        grouped.setdefault(clusters.find(cluster).incident_id, []).append(ev)
 
-    if current:
-        incidents.append(finalize(current))
+    incidents = []
+    for incident_id, incident_events in grouped.items():
+        incidents.append({
+            "incident_id": incident_id,
+            "start_time": min(ev.timestamp for ev in incident_events),
+            "end_time": max(ev.timestamp for ev in incident_events),
+            "systems": list({ev.system for ev in incident_events}),
+            "events": incident_events
+        })
 
+    incidents.sort(key=lambda incident: incident["events"][0].chain_seq)
     return incidents
 
 
-def new_incident(ev):
-    return {
-        "incident_id": str(uuid.uuid4()),
-        "start_time": ev.timestamp,
-        "end_time": ev.timestamp,
-        "systems": {ev.system},
-        "events": [ev]
-    }
+def incident_id_for(ev):
+    return str(uuid.uuid5(INCIDENT_NAMESPACE, ev.event_id))
 
 
-def finalize(incident):
-    incident["systems"] = list(incident["systems"])
-    return incident
-
 def infer_stage_from_dict(ev: dict):
-    action_category = (ev.get("action_category") or "").lower()
-    system_type = (ev.get("system_type") or "").lower()
-    actor = (ev.get("actor") or "").lower()
-
-    if "authentication" in action_category or "sshd" in action_category:
-        return "Initial Access"
-
-    if "process" in action_category or "sudo" in action_category or "command" in action_category:
-        return "Execution"
-
-    if "firewall" in system_type or "network" in system_type:
-        return "Network Activity"
+    return stage_for(ev.get("action_category"), ev.get("system_type"), ev.get("actor"))
 
-    if "root" in actor or "admin" in actor:
-        return "Privilege Escalation"
 
-    return "Activity"
+def stage_for(action_category, system_type, actor):
+    # stage, noise, label and significance rules live in app.rule_table
+    return active_rules().stage(action_category, system_type, actor)
 
 
 def infer_stage_from_model(ev):
-    return infer_stage_from_dict({
-        "action_category": ev.action_category,
-        "system_type": ev.system_type,
-        "actor": ev.actor
-    })
+    # the stage was classified and stored (and hashed) at ingest
+    stage = getattr(ev, "stage", None)
+    if stage:
+        return stage
+    return stage_for(ev.action_category, ev.system_type, ev.actor)
 
 def enrich_events(events):
     enriched = []
@@ -134,12 +129,7 @@ def generate_narrative(events, storylines=None):
 
     actions = " ".join(e["action"].lower() for e in events)
 
-    if "account" in actions:
-        narrative.append("- Evidence of account manipulation.\n")
-    if "powershell" in actions or "script" in actions:
-        narrative.append("- Script-based execution activity detected.\n")
-    if "service" in actions or "persistence" in actions:
-        narrative.append("- Potential persistence mechanisms were established.\n")
+    narrative.extend(active_rules().assessments(actions))
     if len(systems) >= 2:
         narrative.append("- Activity spans multiple systems, indicating lateral behavior.\n")
 
@@ -149,20 +139,8 @@ def generate_narrative(events, storylines=None):
 
 
 def is_noise(ev):
-    action = (ev.action_operation or "").lower()
-    target = (ev.target or "").lower()
-    severity = int(ev.severity or 0)
-
-    if target == "sca":
-        return True
-
-    if action.startswith("cis "):
-        return True
-
-    if any(x in action for x in ["dpkg", "apt", "systemd", "cron"]):
-        return True
+    return noise_for(ev.action_operation, ev.target, ev.severity)
 
-    if severity < 5:
-        return True
 
-    return False
+def noise_for(action_operation, target, severity):
+    return active_rules().is_noise(action_operation, target, severity)
@@ -0,0 +1,235 @@
+# Entities that tie events together. Two events belong to the same incident
+# when a chain of shared entities, each seen again within the window,
+# connects them.
+ENTITY_FIELDS = ("source_ip", "actor", "system", "agent_id")
+
+# Values every host has; linking on them would merge unrelated activity.
+IGNORED_ENTITY_VALUES = {
+    "source_ip": {"127.0.0.1", "::1", "0.0.0.0"},
+    "actor": {"root", "system", "administrator", "sshd", "sudo", "su", "cron", "crond", "systemd", "kernel"},
+    "agent_id": {"000"}
+}
+EMPTY_VALUES = {"", "-", "unknown", "none", "null"}
+
+# entity index size below which it is never swept
+MIN_SWEEP = 4_096
+
+# distinct entity combinations remembered by entity_keys
+ENTITY_CACHE_SIZE = 65_536
+
+_keys = {}
+
+
+def entity_keys(ev):
+    values = (ev.source_ip, ev.actor, ev.system, ev.agent_id)
+    keys = _keys.get(values)
+
+    if keys is None:
+        if len(_keys) >= ENTITY_CACHE_SIZE:
+            _keys.clear()
+        keys = _keys[values] = tuple(key for key in map(entity_key, ENTITY_FIELDS, values) if key)
+
+    return keys
+
+
+def entity_key(field, value):
+    if not value:
+        return None
+
+    normalized = str(value).strip().lower()
+    if normalized in EMPTY_VALUES or normalized in IGNORED_ENTITY_VALUES.get(field, ()):
+        return None
+
+    return f"{field}:{normalized}"
+
+
+class Cluster:
+    __slots__ = (
+        "incident_id", "status", "start_time", "end_time", "first_seq", "last_seq",
+        "event_count", "systems", "entities", "parent"
+    )
+
+    def __init__(self, incident_id, start_time, end_time, first_seq, last_seq,
+                 event_count=0, systems=(), entities=None, status="open"):
+        self.incident_id = incident_id
+        self.status = status
+        self.start_time = start_time
+        self.end_time = end_time
+        self.first_seq = first_seq
+        self.last_seq = last_seq
+        self.event_count = event_count
+        self.systems = set(systems)
+        # entity key -> when it was last seen in this incident
+        self.entities = dict(entities or {})
+        self.parent = None
+
+    def span_with(self, start, end):
+        return max(self.end_time, end) - min(self.start_time, start)
+
+    def extend(self, ev, keys):
+        t = ev.timestamp
+        seq = ev.chain_seq
+
+        if t < self.start_time:
+            self.start_time = t
+        if t > self.end_time:
+            self.end_time = t
+        if seq < self.first_seq:
+            self.first_seq = seq
+        if seq > self.last_seq:
+            self.last_seq = seq
+
+        self.event_count += 1
+        self.systems.add(ev.system)
+
+        entities = self.entities
+        for key in keys:
+            seen = entities.get(key)
+            if seen is None or seen < t:
+                entities[key] = t
+
+    def absorb(self, other):
+        self.start_time = min(self.start_time, other.start_time)
+        self.end_time = max(self.end_time, other.end_time)
+        self.first_seq = min(self.first_seq, other.first_seq)
+        self.last_seq = max(self.last_seq, other.last_seq)
+        self.event_count += other.event_count
+        self.systems |= other.systems
+
+        for key, seen in other.entities.items():
+            if key not in self.entities or self.entities[key] < seen:
+                self.entities[key] = seen
+
+    def recent_entities(self, window):
+        # only entities seen within the window of the last activity can
+        # still link new evidence
+        return {key: seen for key, seen in self.entities.items() if self.end_time - seen <= window}
+
+
+class EntityClusters:
+    """
+    Union-find over incidents connected by shared entities.
+
+    An event joins the open incident that last saw one of its entities
+    within `window`. When its entities point at several open incidents,
+    they are unioned into the one that started first (its id is derived
+    from the earliest event, as for any incident). No incident grows past
+    `max_span`: one that would is closed and the event starts a new one,
+    and a union that would is skipped.
+
+    Entities not seen within the window are swept from the index whenever
+    it has doubled since the last sweep, so memory follows the number of
+    recently active entities, not the size of the stream.
+    """
+
+    def __init__(self, window, max_span, new_id):
+        self.window = window
+        self.max_span = max_span
+        self.new_id = new_id
+
+        # entity key -> (cluster, last seen)
+        self.index = {}
+        self.sweep_at = MIN_SWEEP
+        self.open = {}
+        self.touched = {}
+        self.merged = {}
+
+    def resume(self, cluster):
+        # an incident left open by an earlier pass
+        self.open[cluster.incident_id] = cluster
+        for key, seen in cluster.entities.items():
+            self.index[key] = (cluster, seen)
+
+    def find(self, cluster):
+        root = cluster
+        while root.parent:
+            root = root.parent
+        while cluster.parent and cluster.parent is not root:
+            cluster.parent, cluster = root, cluster.parent
+        return root
+
+    def expire(self, now):
+        oldest = now - self.window
+        self.index = {key: hit for key, hit in self.index.items() if hit[1] >= oldest}
+        self.sweep_at = max(MIN_SWEEP, 2 * len(self.index))
+
+    def add(self, ev):
+        t = ev.timestamp
+        if len(self.index) >= self.sweep_at:
+            self.expire(t)
+
+        keys = entity_keys(ev)
+        index = self.index
+        oldest = t - self.window
+
+        candidates = []
+        for key in keys:
+            hit = index.get(key)
+            if hit and hit[1] >= oldest:
+                root = hit[0] if hit[0].parent is None else self.find(hit[0])
+                if root.status == "open" and root not in candidates:
+                    candidates.append(root)
+
+        if len(candidates) == 1 and candidates[0].span_with(t, t) <= self.max_span:
+            cluster = candidates[0]
+        else:
+            cluster = self.place(ev, candidates)
+            self.open[cluster.incident_id] = cluster
+
+        cluster.extend(ev, keys)
+        self.touched[cluster.incident_id] = cluster
+
+        hit = (cluster, t)
+        for key in keys:
+            index[key] = hit
+
+        return cluster
+
+    def place(self, ev, candidates):
+        t = ev.timestamp
+        accepting = []
+
+        for cluster in candidates:
+            if cluster.span_with(t, t) <= self.max_span:
+                accepting.append(cluster)
+            else:
+                self.close(cluster)
+
+        if not accepting:
+            return Cluster(self.new_id(ev), t, t, ev.chain_seq, ev.chain_seq)
+
+        accepting.sort(key=lambda c: c.first_seq)
+        winner = accepting[0]
+
+        for other in accepting[1:]:
+            start = min(winner.start_time, other.start_time, t)
+            end = max(winner.end_time, other.end_time, t)
+            if end - start <= self.max_span:
+                self.union(winner, other)
+
+        return winner
+
+    def union(self, winner, loser):
+        winner.absorb(loser)
+        loser.parent = winner
+        loser.status = "merged"
+        self.merged[loser.incident_id] = loser
+        self.open.pop(loser.incident_id, None)
+        self.touched.pop(loser.incident_id, None)
+        self.touched[winner.incident_id] = winner
+
+    def close(self, cluster):
+        cluster.status = "closed"
+        self.open.pop(cluster.incident_id, None)
+        self.touched[cluster.incident_id] = cluster
+
+    def close_idle(self, now):
+        # `now` is the evidence clock (the newest timestamp consumed), not
+        # wall-clock time: later evidence is never stamped earlier, so once
+        # the window has passed on it nothing can extend an incident
+        for cluster in list(self.open.values()):
+            if now - cluster.end_time > self.window:
+                self.close(cluster)
+
+    def merged_into(self):
+        return {incident_id: self.find(c).incident_id for incident_id, c in self.merged.items()}
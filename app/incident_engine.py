@@ -0,0 +1,179 @@
+import threading
+from datetime import datetime
+
+from app.models import EvidenceEvent, Incident, EngineWatermark, IncidentTimeline, IncidentFacet
+from app.event_record import stream_records
+from app.incident_clusters import Cluster, EntityClusters
+from app.incident_builder import (
+    INCIDENT_WINDOW,
+    MAX_INCIDENT_SPAN,
+    EXCLUDED_SYSTEMS,
+    is_noise,
+    incident_id_for
+)
+
+ENGINE_NAME = "incidents"
+STREAM_BATCH = 5_000
+
+# one engine pass at a time per process; passes are cheap when idle
+_lock = threading.Lock()
+
+# Incidents changed by any pass since the live feed last collected them.
+# Whichever request happens to run the pass, the feed still sees its work.
+_changed = set()
+_merged = {}
+
+
+def collect_changes():
+    with _lock:
+        changed = sorted(_changed)
+        merged = dict(_merged)
+        _changed.clear()
+        _merged.clear()
+    return changed, merged
+
+
+class IncidentEngine:
+    """
+    Incremental form of build_incidents().
+
+    Incidents are persisted. Each pass consumes only evidence appended since
+    the engine's watermark and clusters it with the incidents still open,
+    whose recently seen entities are stored with them. Only rows that gain
+    (or, when incidents merge, change) an incident_id are written. Ids are
+    derived from each incident's first event, so they are stable and match
+    a full rebuild.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def watermark(self):
+        state = self.session.get(EngineWatermark, ENGINE_NAME)
+        return state.last_seq if state else -1
+
+    def open_incidents(self):
+        return self.session.query(Incident)\
+            .filter(Incident.status == "open")\
+            .order_by(Incident.start_time)\
+            .all()
+
+    def evidence_clock(self, chain_seq):
+        # Timestamps never decrease along the chain, so nothing appended
+        # after this row can be stamped earlier than it. Wall-clock time is
+        # no bound: archive backfills carry their original alert times.
+        return self.session.query(EvidenceEvent.timestamp)\
+            .filter(EvidenceEvent.chain_seq == chain_seq)\
+            .scalar()
+
+    def update(self, now=None):
+        with _lock:
+            return self._update(now)
+
+    def _update(self, now):
+        session = self.session
+        after = self.watermark()
+
+        clusters = EntityClusters(INCIDENT_WINDOW, MAX_INCIDENT_SPAN, incident_id_for)
+        rows = {}
+        for inc in self.open_incidents():
+            rows[inc.incident_id] = inc
+            clusters.resume(cluster_from_row(inc))
+
+        events = stream_records(session, EvidenceEvent.chain_seq > after, batch=STREAM_BATCH)
+
+        members = []
+        last_seq = after
+
+        for ev in events:
+            last_seq = ev.chain_seq
+
+            if ev.system in EXCLUDED_SYSTEMS or is_noise(ev):
+                continue
+
+            members.append((ev.event_id, ev.incident_id, clusters.add(ev)))
+
+        now = now or self.evidence_clock(last_seq)
+        if now:
+            clusters.close_idle(now)
+        merged = clusters.merged_into()
+
+        # incidents absorbed by another: move their evidence, drop their rows
+        for loser, winner in merged.items():
+            if loser in rows:
+                session.query(EvidenceEvent)\
+                    .filter(EvidenceEvent.incident_id == loser)\
+                    .update({EvidenceEvent.incident_id: winner}, synchronize_session=False)
+                session.delete(rows.pop(loser))
+
+        if merged:
+            losers = list(merged)
+            session.query(IncidentFacet).filter(IncidentFacet.incident_id.in_(losers)).delete(synchronize_session=False)
+            session.query(IncidentTimeline).filter(IncidentTimeline.incident_id.in_(losers)).delete(synchronize_session=False)
+
+        for incident_id, cluster in clusters.touched.items():
+            inc = rows.get(incident_id)
+            if inc is None:
+                inc = rows[incident_id] = Incident(incident_id=incident_id)
+                session.add(inc)
+            write_row(inc, cluster, INCIDENT_WINDOW)
+
+        assignments = []
+        for event_id, current, cluster in members:
+            incident_id = clusters.find(cluster).incident_id
+            if current != incident_id:
+                assignments.append({"event_id": event_id, "incident_id": incident_id})
+
+        if assignments:
+            session.bulk_update_mappings(EvidenceEvent, assignments)
+
+        if last_seq != after:
+            session.merge(EngineWatermark(engine=ENGINE_NAME, last_seq=last_seq))
+
+        session.commit()
+
+        _changed.update(clusters.touched)
+        _changed.difference_update(merged)
+        _merged.update(merged)
+
+        return {
+            "consumed_through_seq": last_seq,
+            "assigned_events": len(assignments),
+            "updated_incidents": sorted(clusters.touched),
+            "merged_incidents": merged
+        }
+
+
+def cluster_from_row(inc):
+    if inc.entities is None:
+        # left open before entities were stored: its hosts still link
+        entities = {f"system:{system.lower()}": inc.end_time for system in inc.systems or []}
+    else:
+        entities = {key: datetime.fromisoformat(seen) for key, seen in inc.entities.items()}
+
+    return Cluster(
+        inc.incident_id,
+        inc.start_time,
+        inc.end_time,
+        inc.first_seq,
+        inc.last_seq,
+        inc.event_count,
+        inc.systems or [],
+        entities
+    )
+
+
+def write_row(inc, cluster, window):
+    inc.status = cluster.status
+    inc.start_time = cluster.start_time
+    inc.end_time = cluster.end_time
+    inc.systems = sorted(cluster.systems)
+    inc.first_seq = cluster.first_seq
+    inc.last_seq = cluster.last_seq
+    inc.event_count = cluster.event_count
+
+    # a closed incident never links again, so only open ones keep entities
+    if cluster.status == "open":
+        inc.entities = {key: seen.isoformat() for key, seen in cluster.recent_entities(window).items()}
+    else:
+        inc.entities = None
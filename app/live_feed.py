@@ -0,0 +1,193 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from app.database import SessionLocal
+from app.models import Incident
+from app.incident_engine import IncidentEngine, collect_changes
+from app.timeline_store import incident_timeline, incident_summary, to_json
+
+# Events kept for clients reconnecting with Last-Event-ID.
+REPLAY_EVENTS = 1_000
+# Commits arriving within this window are folded into one derivation pass.
+DEBOUNCE_SECONDS = 0.5
+KEEPALIVE_SECONDS = 15
+# Messages queued per subscriber. A client that falls this far behind is
+# sent one "resync" instead of the backlog and should reload.
+SUBSCRIBER_BACKLOG = 1_000
+RESYNC = "event: resync\ndata: {}\n\n"
+
+
+def sse_message(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+
+
+class LiveFeed:
+    """
+    In-process fan-out of evidence changes to Server-Sent Events clients.
+
+    Publishing is thread-safe (collectors run in worker threads); every
+    subscriber owns an asyncio.Queue fed on its own event loop. Recent
+    messages are kept so a reconnecting client resumes where it left off.
+    """
+
+    def __init__(self, replay=REPLAY_EVENTS):
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.recent = deque(maxlen=replay)
+        self.subscribers = set()
+
+    def publish(self, kind, data):
+        with self.lock:
+            self.last_id += 1
+            message = sse_message(self.last_id, kind, to_json(data))
+            self.recent.append((self.last_id, message))
+            subscribers = list(self.subscribers)
+
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(deliver, queue, message)
+
+    def subscribe(self, after_id=None):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG)
+
+        with self.lock:
+            if after_id is not None:
+                for event_id, message in self.recent:
+                    if event_id > after_id:
+                        deliver(queue, message)
+            self.subscribers.add((loop, queue))
+
+        return loop, queue
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def has_subscribers(self):
+        with self.lock:
+            return bool(self.subscribers)
+
+    async def stream(self, after_id=None):
+        subscriber = self.subscribe(after_id)
+        _, queue = subscriber
+
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def deliver(queue, message):
+    # runs on the subscriber's loop
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+
+
+def block_changes(previous, current):
+    # Blocks are in time order and new evidence only extends the tail, so
+    # comparing by position finds both grown and newly formed blocks.
+    previous = previous or []
+    return [
+        (index, block)
+        for index, block in enumerate(current)
+        if index >= len(previous) or previous[index] != block
+    ]
+
+
+class LivePublisher:
+    """
+    Turns committed evidence into feed messages.
+
+    Writers call notify() after each commit; a background thread waits for
+    the burst to settle, runs one incident engine pass and re-derives only
+    the incidents changed since the last publish (by its own pass or one a
+    request ran meanwhile), then publishes the changed blocks. Blocks are
+    compared with what this publisher last sent, not the stored view, which
+    requests may already have refreshed. Nothing is derived while no client
+    is listening.
+    """
+
+    def __init__(self, feed, debounce=DEBOUNCE_SECONDS):
+        self.feed = feed
+        self.debounce = debounce
+        self.pending = threading.Event()
+        self.lock = threading.Lock()
+        self.stored = 0
+        self.head_seq = None
+        # incident id -> timeline last published, for open incidents
+        self.published = {}
+        self.thread = threading.Thread(target=self.run, name="live-publisher", daemon=True)
+        self.thread.start()
+
+    def notify(self, rows):
+        if not rows:
+            return
+        with self.lock:
+            self.stored += len(rows)
+            self.head_seq = rows[-1]["chain_seq"]
+        self.pending.set()
+
+    def run(self):
+        while True:
+            self.pending.wait()
+            time.sleep(self.debounce)
+            self.pending.clear()
+
+            with self.lock:
+                stored, self.stored = self.stored, 0
+                head_seq = self.head_seq
+            self.feed.publish("evidence", {"stored": stored, "head_seq": head_seq})
+
+            if self.feed.has_subscribers():
+                try:
+                    self.publish_changes()
+                except Exception as e:
+                    self.feed.publish("error", {"message": str(e)})
+            else:
+                collect_changes()
+                self.published.clear()
+
+    def publish_changes(self):
+        session = SessionLocal()
+
+        try:
+            IncidentEngine(session).update()
+            changed, merged = collect_changes()
+
+            # incidents joined by shared entities; the survivor follows below
+            for incident_id, into in merged.items():
+                self.published.pop(incident_id, None)
+                self.feed.publish("merged", {"incident_id": incident_id, "into": into})
+
+            for incident_id in changed:
+                inc = session.get(Incident, incident_id)
+                if inc is None:
+                    continue
+
+                stored = incident_timeline(session, inc)
+                session.commit()
+
+                previous = self.published.pop(incident_id, None)
+                if inc.status == "open":
+                    self.published[incident_id] = stored.timeline
+
+                self.feed.publish("incident", incident_summary(inc, stored))
+                for index, block in block_changes(previous, stored.timeline):
+                    self.feed.publish("block", {
+                        "incident_id": incident_id,
+                        "index": index,
+                        "block": block
+                    })
+        finally:
+            session.close()
@@ -1,15 +1,48 @@
-from fastapi import FastAPI
-from app.database import init_db, SessionLocal
-from app.wazuh_client import WazuhClient
-from app.normalizer import normalize
-from app.evidence_chain import compute_hash
-from app.models import EvidenceEvent
-from app.incident_builder import build_incidents, generate_narrative, infer_stage_from_dict
-from app.event_compressor import compress_events
-from app.evidence_verifier import verify_incident
-from app.storyline_builder import build_storylines
-import uuid
+import asyncio
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Request, Header
+from fastapi.responses import Response, StreamingResponse
+from app.database import init_db, ReadSession, session_scope, run_read
+from app.evidence_writer import chain_write_lock
+from app.collection_service import CollectionService
+from app.collection_sources import load_sources
+from app.dedup_index import DedupIndex
+from app.archive_ingest import ingest_archives, archive_root, resolve_archive_paths
+from app.models import EvidenceEvent, Incident
+from app.incident_engine import IncidentEngine
+from app.timeline_store import (
+    incident_timeline,
+    incident_view,
+    incident_summary,
+    refresh_timelines,
+    query_incidents,
+    page_incidents,
+    to_json,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE
+)
+from app.live_feed import LiveFeed, LivePublisher
+from app.response_cache import (
+    ResponseCache,
+    evidence_state,
+    incident_state,
+    make_etag,
+    etag_matches
+)
+from app.blob_store import blob_stats
+from app.rule_table import active_rules, reload_rules
+from app.evidence_verifier import verify_incident_events, verify_incremental
+from app.evidence_checkpoints import (
+    commit_checkpoints,
+    latest_checkpoint,
+    verify_checkpoint_chain,
+    verify_range,
+    inclusion_proof
+)
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -17,150 +50,301 @@ load_dotenv()
 app = FastAPI()
 init_db()
 
-wazuh = WazuhClient(
-    base_url=os.getenv("WAZUH_URL"),
-    username=os.getenv("WAZUH_USER"),
-    password=os.getenv("WAZUH_PASS"),
-    verify_ssl=False
+sources = load_sources()
+dedup = DedupIndex()
+responses = ResponseCache()
+feed = LiveFeed()
+publisher = LivePublisher(feed)
+collector = CollectionService(sources, dedup=dedup, on_commit=publisher.notify)
+
+# CPU-bound work (hashing, derivation) runs here, off the event loop and
+# bounded, so a few long verifications cannot take every worker thread.
+analysis_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ANALYSIS_WORKERS", "4")),
+    thread_name_prefix="analysis"
 )
 
-def get_last_cursor(session):
-    ev = session.query(EvidenceEvent)\
-        .order_by(EvidenceEvent.wazuh_timestamp.desc(),
-                  EvidenceEvent.wazuh_id.desc())\
-        .first()
-
-    if not ev:
-        return "1970-01-01T00:00:00Z", None
-
-    return ev.wazuh_timestamp, ev.wazuh_id
-
-@app.get("/collect/wazuh")
-def collect():
-    session = SessionLocal()
-    session_id = str(uuid.uuid4())
-
-    last_ts, last_id = get_last_cursor(session)
-
-    last_event = session.query(EvidenceEvent)\
-        .order_by(EvidenceEvent.timestamp.desc())\
-        .first()
-
-    prev_hash = last_event.current_hash if last_event else "GENESIS"
-    stored = 0
-
-    while True:
-        alerts = wazuh.get_recent_events(
-            since_ts=last_ts,
-            since_id=last_id,
-            size=500
-        )
-
-        if not alerts:
-            break
+async def offload(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(analysis_pool, fn, *args)
 
-        for hit in alerts:
-            alert = hit["_source"]
-            alert["_id"] = hit["_id"]
-            alert["_index"] = hit["_index"]
+def warm_up():
+    with session_scope() as session:
+        commit_checkpoints(session)
 
-            ev = normalize(alert)
-            ev["stage"] = infer_stage_from_dict(ev)
+warm_up()
 
-            exists = session.query(EvidenceEvent)\
-                .filter(EvidenceEvent.wazuh_id == ev["wazuh_id"])\
-                .first()
-            if exists:
-                continue
+if os.getenv("COLLECT_TAIL", "false").lower() == "true":
+    collector.start(tail=True)
 
-            current_hash = compute_hash(prev_hash, ev)
+@app.post("/collect/jobs", status_code=202)
+async def start_collection(tail: bool = False, interval: Optional[float] = None):
+    # returns the running job instead when one is already active
+    job, created = collector.start(tail=tail, interval=interval)
+    return {"created": created, **job.status()}
 
-            record = EvidenceEvent(
-                system=ev["system"],
-                system_type=ev["system_type"],
-                source_ip=ev["source_ip"],
+@app.get("/collect/jobs/current")
+async def current_collection():
+    if collector.current is None:
+        raise HTTPException(status_code=404, detail="No collection job has run")
+    return collector.current.status()
 
-                actor=ev["actor"],
-                action_category=ev["action_category"],
-                action_operation=ev["action_operation"],
+@app.get("/collect/jobs/{job_id}")
+async def collection_status(job_id: str):
+    job = collector.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.status()
 
-                target=ev["target"],
-                raw_log=ev["raw_log"],
-                severity=ev["severity"],
+@app.post("/collect/jobs/{job_id}/stop")
+async def stop_collection(job_id: str):
+    job = collector.stop(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.status()
 
-                prev_hash=prev_hash,
-                current_hash=current_hash,
-
-                session_id=session_id,
-                incident_id=None,
-
-                # forensic linkage
-                wazuh_id=ev["wazuh_id"],
-                wazuh_index=ev["wazuh_index"],
-                wazuh_timestamp=ev["wazuh_timestamp"],
-                rule_id=ev["rule_id"],
-                mitre=ev["mitre"],
-                agent_id=ev["agent_id"],
-                stage=ev["stage"]
-            )
-
-            session.add(record)
-            session.commit()
-
-            prev_hash = current_hash
-            stored += 1
+@app.get("/collect/wazuh")
+async def collect():
+    # kept for older clients: starts a one-off pass and returns immediately
+    job, created = collector.start()
+    return {"status": "started" if created else "running", **job.status()}
+
+@app.post("/ingest/archive")
+async def ingest_archive(paths: List[str], workers: Optional[int] = None):
+    # paths are relative to ARCHIVE_DIR; anything else is refused
+    root = archive_root()
+    if root is None:
+        raise HTTPException(status_code=403, detail="Archive ingest is disabled; set ARCHIVE_DIR")
+
+    try:
+        paths = resolve_archive_paths(paths, root)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def work():
+        with session_scope() as session, chain_write_lock:
+            return ingest_archives(paths, session, workers=workers, dedup=dedup, on_commit=publisher.notify)
+
+    report = await offload(work)
+    return {"status": "ok", **report}
+
+@app.get("/collect/dedup")
+async def dedup_stats():
+    return dedup.stats()
+
+def cached_response(request, etag, build):
+    # 304 when the client already holds this state, otherwise the rendered
+    # body from cache, building it only on a miss
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        responses.not_modified()
+        return Response(status_code=304, headers=headers)
+
+    body = responses.get(etag)
+    if body is None:
+        body = responses.put(etag, build())
+
+    return Response(body, media_type="application/json", headers=headers)
 
-        last_ts = alerts[-1]["_source"]["@timestamp"]
-        last_id = alerts[-1]["_id"]
+@app.get("/timeline")
+async def timeline(request: Request):
+    def work():
+        with session_scope() as session:
+            IncidentEngine(session).update()
+            etag = make_etag(evidence_state(session), request.url.path, request.url.query)
+
+            def build():
+                incidents = session.query(Incident).order_by(Incident.start_time).all()
+                response = [
+                    incident_view(inc, incident_timeline(session, inc))
+                    for inc in incidents
+                ]
+                session.commit()
+                return response
+
+            return cached_response(request, etag, build)
+
+    return await offload(work)
+
+@app.get("/timeline/live")
+async def timeline_live(last_event_id: Optional[int] = Header(default=None)):
+    # Server-Sent Events: "evidence" per committed burst, then "incident"
+    # summaries and changed "block"s for every incident it touched; a client
+    # that falls behind gets "resync" in place of what it missed
+    return StreamingResponse(
+        feed.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return responses.stats()
+
+@app.get("/rules")
+async def get_rules():
+    return active_rules().describe()
+
+@app.post("/rules/reload")
+async def reload_rule_table():
+    # Re-reads RULES_FILE. Stored views and ETags carry the rule fingerprint,
+    # so anything derived under the old rules is rebuilt on next read.
+    try:
+        rules = reload_rules()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "reloaded", "source": rules.source, "fingerprint": rules.fingerprint}
+
+def refresh_incidents():
+    with session_scope() as session:
+        IncidentEngine(session).update()
+        refresh_timelines(session)
+
+@app.get("/incidents")
+async def list_incidents(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    system: Optional[str] = None,
+    stage: Optional[str] = None,
+    min_significance: Optional[int] = None
+):
+    def work():
+        with session_scope() as session:
+            IncidentEngine(session).update()
+            etag = make_etag(evidence_state(session), request.url.path, request.url.query)
+
+            def build():
+                refresh_timelines(session)
+                query = query_incidents(session, since, until, system, stage, min_significance)
+                rows, next_cursor = page_incidents(query, cursor, limit)
+                return {
+                    "items": [incident_summary(inc, stored) for inc, stored in rows],
+                    "next_cursor": next_cursor,
+                    # all incidents matching the filters, across pages
+                    "total": query.count()
+                }
+
+            return cached_response(request, etag, build)
+
+    try:
+        return await offload(work)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/incidents/export")
+async def export_incidents(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    system: Optional[str] = None,
+    stage: Optional[str] = None,
+    min_significance: Optional[int] = None
+):
+    await offload(refresh_incidents)
+
+    def lines():
+        # one full incident per line, read a page at a time
+        cursor = None
+        with session_scope(ReadSession) as session:
+            while True:
+                query = query_incidents(session, since, until, system, stage, min_significance)
+                rows, cursor = page_incidents(query, cursor, MAX_PAGE_SIZE)
+                for inc, stored in rows:
+                    yield json.dumps(to_json(incident_view(inc, stored))) + "\n"
+                session.expunge_all()
+                if not cursor:
+                    break
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/incidents/{incident_id}")
+async def incident_detail(incident_id: str, request: Request):
+    def work():
+        with session_scope() as session:
+            IncidentEngine(session).update()
+
+            inc = session.get(Incident, incident_id)
+            if inc is None:
+                raise HTTPException(status_code=404, detail="Unknown incident")
+
+            etag = make_etag(incident_state(inc), request.url.path)
+
+            def build():
+                response = incident_view(inc, incident_timeline(session, inc))
+                session.commit()
+                return response
+
+            return cached_response(request, etag, build)
+
+    return await offload(work)
+
+def checkpoint_status(session):
+    latest = latest_checkpoint(session)
+    return {
+        "latest": {
+            "block_index": latest.block_index,
+            "last_seq": latest.last_seq,
+            "merkle_root": latest.merkle_root,
+            "checkpoint_hash": latest.checkpoint_hash
+        } if latest else None,
+        "verification": verify_checkpoint_chain(session)
+    }
 
-    session.close()
-    return {"status": "ok", "stored": stored}
+@app.get("/evidence/checkpoints")
+async def evidence_checkpoints():
+    return await run_read(checkpoint_status)
 
-@app.get("/timeline")
-def timeline():
-    session = SessionLocal()
-    events = session.query(EvidenceEvent).order_by(EvidenceEvent.timestamp).all()
+@app.get("/evidence/storage")
+async def evidence_storage():
+    return await run_read(blob_stats)
 
-    incidents = build_incidents(events)
+@app.get("/evidence/verify/range")
+async def verify_evidence_range(first_seq: int, last_seq: int):
+    def work():
+        with session_scope(ReadSession) as session:
+            return verify_range(session, max(first_seq, 0), last_seq)
 
-    for inc in incidents:
-        for ev in inc["events"]:
-            ev.incident_id = inc["incident_id"]
-            session.add(ev)
-    session.commit()
+    return {
+        "first_seq": first_seq,
+        "last_seq": last_seq,
+        "verification": await offload(work)
+    }
 
-    response = []
+@app.get("/evidence/proof/{event_id}")
+async def evidence_proof(event_id: str):
+    proof = await run_read(inclusion_proof, event_id)
 
-    for inc in incidents:
-        compressed = compress_events(inc["events"])
-        storylines = build_storylines(compressed)
-        narrative = generate_narrative(compressed, storylines)
+    if proof is None:
+        raise HTTPException(status_code=404, detail="Unknown event")
 
-        response.append({
-            "incident_id": inc["incident_id"],
-            "start_time": inc["start_time"],
-            "end_time": inc["end_time"],
-            "systems": inc["systems"],
+    return proof
 
-            "storylines": storylines, 
-            "timeline": compressed,
-            "narrative": narrative
-        })
+@app.get("/evidence/verify")
+async def verify_all_evidence(full: bool = False):
+    def work():
+        # writes the verification watermark, so not a read session
+        with session_scope() as session:
+            return verify_incremental(session, full=full)
 
-    return response
+    return {"verification": await offload(work)}
 
 @app.get("/evidence/verify/{incident_id}")
-def verify_evidence(incident_id: str):
-    session = SessionLocal()
-
-    events = session.query(EvidenceEvent)\
-    .order_by(EvidenceEvent.timestamp, EvidenceEvent.event_id)\
-    .all()
+async def verify_evidence(incident_id: str):
+    def work():
+        with session_scope(ReadSession) as session:
+            event_count = session.query(EvidenceEvent)\
+                .filter(EvidenceEvent.incident_id == incident_id)\
+                .count()
+            return event_count, verify_incident_events(session, incident_id)
 
-    result = verify_incident(events)
+    event_count, result = await offload(work)
 
     return {
         "incident_id": incident_id,
-        "event_count": len(events),
+        "event_count": event_count,
         "verification": result
     }
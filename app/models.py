@@ -1,8 +1,11 @@
-from sqlalchemy import Column, String, DateTime, Text, JSON
+from sqlalchemy import Column, String, DateTime, Text, JSON, Integer, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship, deferred
 import uuid
 from datetime import datetime
 
+from app.blob_codec import decode_blob, UNREADABLE
+
 Base = declarative_base()
 
 class EvidenceEvent(Base):
@@ -20,14 +23,18 @@ class EvidenceEvent(Base):
     action_operation = Column(String)
 
     target = Column(String)
-    raw_log = Column(Text)
+    # New rows keep the raw payload in evidence_blobs and only reference it;
+    # rows stored before that keep their inline text in the raw_log column.
+    raw_log_inline = deferred(Column("raw_log", Text))
+    raw_ref = Column(String, index=True)
     severity = Column(String)
 
     prev_hash = Column(String)
     current_hash = Column(String)
+    chain_seq = Column(Integer, unique=True, index=True)
     
     session_id = Column(String)
-    incident_id = Column(String)
+    incident_id = Column(String, index=True)
     
     wazuh_id = Column(String, unique=True, index=True)
     wazuh_index = Column(String)
@@ -39,4 +46,132 @@ class EvidenceEvent(Base):
 
     stage = Column(String)
 
+    blob = relationship(
+        "EvidenceBlob",
+        primaryjoin="foreign(EvidenceEvent.raw_ref) == EvidenceBlob.digest",
+        viewonly=True
+    )
+
+    @property
+    def raw_log(self):
+        # the exact text that was hashed into the chain
+        if self.raw_ref is None:
+            return self.raw_log_inline
+        if self.blob is None:
+            # the blob row is gone; reads as tampering, like a damaged one
+            return UNREADABLE
+        return self.blob.text()
+
+
+class EvidenceBlob(Base):
+    __tablename__ = "evidence_blobs"
+
+    # sha256 of the UTF-8 payload, so identical lines are stored once
+    digest = Column(String, primary_key=True)
+    codec = Column(String)
+    size = Column(Integer)
+    data = Column(LargeBinary)
+
+    def text(self):
+        # one decode per blob per session; identical lines share the instance
+        if not hasattr(self, "_text"):
+            self._text = decode_blob(self.digest, self.codec, self.data)
+        return self._text
+
+
+class CollectionCursor(Base):
+    __tablename__ = "collection_cursors"
+
+    source = Column(String, primary_key=True)
+    last_ts = Column(String)
+    last_id = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class EvidenceCheckpoint(Base):
+    __tablename__ = "evidence_checkpoints"
+
+    block_index = Column(Integer, primary_key=True)
+    first_seq = Column(Integer)
+    last_seq = Column(Integer)
+
+    merkle_root = Column(String)
+    prev_checkpoint_hash = Column(String)
+    checkpoint_hash = Column(String)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class VerificationWatermark(Base):
+    __tablename__ = "verification_watermarks"
+
+    scope = Column(String, primary_key=True)
+    verified_seq = Column(Integer)
+    verified_hash = Column(String)
+    verified_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Incident(Base):
+    __tablename__ = "incidents"
+
+    incident_id = Column(String, primary_key=True)
+    status = Column(String, index=True)
+
+    start_time = Column(DateTime, index=True)
+    end_time = Column(DateTime, index=True)
+    systems = Column(JSON)
+
+    first_seq = Column(Integer)
+    last_seq = Column(Integer)
+    event_count = Column(Integer)
+
+    # entity key -> last seen (ISO), kept while the incident is open so the
+    # next engine pass can link new evidence to it
+    entities = Column(JSON)
+
+
+class EngineWatermark(Base):
+    __tablename__ = "engine_watermarks"
+
+    engine = Column(String, primary_key=True)
+    last_seq = Column(Integer)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# --- derived interpretation (rebuildable, never evidence) ---
+
+class IncidentTimeline(Base):
+    __tablename__ = "incident_timelines"
+
+    incident_id = Column(String, primary_key=True)
+    evidence_hash = Column(String)
+    derivation_version = Column(Integer)
+    rules_fingerprint = Column(String)
+
+    # signature of the incident row the view was built from
+    last_seq = Column(Integer)
+    event_count = Column(Integer)
+
+    timeline = Column(JSON)
+    storylines = Column(JSON)
+    narrative = Column(Text)
+
+    # summary columns for listing and filtering without loading the JSON
+    stages = Column(JSON)
+    block_count = Column(Integer)
+    storyline_count = Column(Integer)
+    max_significance = Column(Integer, index=True)
+
+    computed_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IncidentFacet(Base):
+    __tablename__ = "incident_facets"
+
+    incident_id = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
 
+    __table_args__ = (
+        Index("ix_incident_facets_kind_value", "kind", "value", "incident_id"),
+    )
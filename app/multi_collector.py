@@ -0,0 +1,145 @@
+import asyncio
+import heapq
+import time
+from collections import deque
+
+from app.evidence_writer import prepare_page
+from app.collector_pipeline import StageStats, PAGE_SIZE
+from app.collection_sources import get_source_cursor
+
+SOURCE_QUEUE_DEPTH = 2
+
+
+class MultiSourceCollector:
+    """
+    Collects from several indexers at once and merges them into one chain.
+
+    Every source fetches and normalizes in its own task (blocking HTTP and
+    normalize() run in worker threads), each from its own cursor. A k-way
+    merge on (@timestamp, source, _id) then feeds the single writer, so the
+    chain is extended in timestamp order no matter which source answered
+    first. A source's cursor only advances together with the page that
+    contains its events.
+    """
+
+    def __init__(self, sources, writer, page_size=PAGE_SIZE, depth=SOURCE_QUEUE_DEPTH):
+        self.sources = sources
+        self.writer = writer
+        self.page_size = page_size
+        self.depth = depth
+
+        self.stats = {s.name: StageStats(s.name) for s in sources}
+        self.write_stats = StageStats("write")
+
+    def run(self):
+        return asyncio.run(self.collect())
+
+    async def collect(self):
+        started = time.perf_counter()
+        session = self.writer.session
+
+        queues = {s.name: asyncio.Queue(maxsize=self.depth) for s in self.sources}
+        producers = [
+            asyncio.create_task(self.produce(s, queues[s.name], *get_source_cursor(session, s.name)))
+            for s in self.sources
+        ]
+
+        try:
+            await self.merge(queues)
+        finally:
+            for task in producers:
+                task.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
+
+        wall = time.perf_counter() - started
+        return {
+            "stored": self.writer.stored,
+            "elapsed_seconds": round(wall, 3),
+            "sources": {name: s.report(wall) for name, s in self.stats.items()},
+            "stages": {"write": self.write_stats.report(wall)}
+        }
+
+    # --- per-source producers ---
+
+    def next_batch(self, source, pages):
+        hits = next(pages, None)
+        if hits is None:
+            return None
+
+        events = prepare_page(hits)
+        return [
+            (hit["_source"]["@timestamp"], source.name, hit["_id"], ev)
+            for hit, ev in zip(hits, events)
+        ]
+
+    async def produce(self, source, q, since_ts, since_id):
+        pages = source.pages(since_ts, since_id, size=self.page_size)
+        stats = self.stats[source.name]
+
+        try:
+            while True:
+                started = time.perf_counter()
+                batch = await asyncio.to_thread(self.next_batch, source, pages)
+                if batch is None:
+                    break
+                stats.record(len(batch), started)
+                await q.put(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await q.put(e)
+            return
+        finally:
+            try:
+                pages.close()
+            except ValueError:
+                # still running in its worker thread; the PIT will expire
+                pass
+
+        await q.put(None)
+
+    # --- ordered merge into the writer ---
+
+    async def merge(self, queues):
+        buffers = {}
+        heap = []
+
+        async def refill(name):
+            item = await queues[name].get()
+            if isinstance(item, Exception):
+                raise item
+            if item is None:
+                return False
+            buffers[name] = deque(item)
+            heapq.heappush(heap, (buffers[name][0][:3], name))
+            return True
+
+        for name in queues:
+            await refill(name)
+
+        pending = []
+        cursors = {}
+
+        while heap:
+            _, name = heapq.heappop(heap)
+            ts, _, hit_id, ev = buffers[name].popleft()
+
+            pending.append(ev)
+            cursors[name] = (ts, hit_id)
+
+            if len(pending) >= self.page_size:
+                await self.flush(pending, cursors)
+                pending, cursors = [], {}
+
+            if buffers[name]:
+                heapq.heappush(heap, (buffers[name][0][:3], name))
+            else:
+                await refill(name)
+
+        if pending or cursors:
+            await self.flush(pending, cursors)
+
+    async def flush(self, events, cursors):
+        started = time.perf_counter()
+        await asyncio.to_thread(self.writer.write_page, events, cursors)
+        self.write_stats.record(len(events), started)
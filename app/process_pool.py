@@ -0,0 +1,12 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def worker_pool(workers, initializer=None):
+    # Workers come from a forkserver, not a fork of this process: forking
+    # the threaded API server can copy a lock another thread holds.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=initializer,
+        mp_context=multiprocessing.get_context("forkserver")
+    )
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from app.models import EvidenceEvent, Incident
+from app.timeline_store import to_json, derivation_tag
+
+# Rendered bodies kept in memory; the least recently used is evicted first.
+CACHE_ENTRIES = 256
+
+
+def evidence_state(session):
+    """
+    Everything a derived response depends on: the chain head (seq and hash),
+    the incidents that are still open, and the derivation version and rules.
+
+    Call after IncidentEngine.update() so incidents closed by newly consumed
+    evidence are reflected; with no new evidence that pass is a few queries.
+    """
+    head = session.query(EvidenceEvent.chain_seq, EvidenceEvent.current_hash)\
+        .order_by(EvidenceEvent.chain_seq.desc())\
+        .first()
+
+    open_incidents = session.query(Incident.incident_id)\
+        .filter(Incident.status == "open")\
+        .order_by(Incident.incident_id)\
+        .all()
+
+    return (
+        derivation_tag(),
+        head.chain_seq if head else -1,
+        head.current_hash if head else "",
+        ",".join(incident_id for (incident_id,) in open_incidents)
+    )
+
+
+def incident_state(inc):
+    # a single incident's view only changes when its own signature does
+    return (derivation_tag(), inc.incident_id, inc.status, inc.last_seq, inc.event_count)
+
+
+def make_etag(state, path, query=""):
+    payload = "|".join(str(part) for part in state) + f"|{path}?{query}"
+    return '"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCache:
+    """
+    Rendered JSON bodies keyed by ETag.
+
+    The ETag already encodes the evidence state and the request, so an entry
+    can never be served for a different state; stale entries simply stop
+    being asked for and fall out of the LRU.
+    """
+
+    def __init__(self, size=CACHE_ENTRIES):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def get(self, etag):
+        with self.lock:
+            body = self.entries.get(etag)
+            if body is None:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(etag)
+            self.counters["hits"] += 1
+            return body
+
+    def put(self, etag, payload):
+        body = json.dumps(to_json(payload)).encode("utf-8")
+
+        with self.lock:
+            self.entries[etag] = body
+            self.entries.move_to_end(etag)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+        return body
+
+    def not_modified(self):
+        with self.lock:
+            self.counters["not_modified"] += 1
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "capacity": self.size, **self.counters}
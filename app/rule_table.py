@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+
+# Distinct inputs remembered per compiled rule set. Hosts, actors and rule
+# texts repeat heavily, so hit rates are high.
+CLASSIFICATION_CACHE_SIZE = 65_536
+
+# Keyword rules match when any keyword occurs in the lowercased field.
+# Ordered lists ("stages", "labels") stop at the first matching rule.
+# RULES_FILE may point at a JSON file overriding any top-level section.
+DEFAULT_RULES = {
+    "noise": {
+        "min_severity": 5,
+        "targets": ["sca"],
+        "action_prefixes": ["cis "],
+        "action_keywords": ["dpkg", "apt", "systemd", "cron"]
+    },
+    "stages": [
+        {"field": "action_category", "keywords": ["authentication", "sshd"], "stage": "Initial Access"},
+        {"field": "action_category", "keywords": ["process", "sudo", "command"], "stage": "Execution"},
+        {"field": "system_type", "keywords": ["firewall", "network"], "stage": "Network Activity"},
+        {"field": "actor", "keywords": ["root", "admin"], "stage": "Privilege Escalation"}
+    ],
+    "default_stage": "Activity",
+    "labels": [
+        {"field": "action", "keywords": ["new user added", "new group added"], "label": "Account creation / modification"},
+        {"field": "action", "keywords": ["new windows service created"], "label": "Persistence mechanism established"},
+        {"field": "action", "keywords": ["powershell"], "label": "Suspicious script execution"},
+        {"field": "action", "keywords": ["executable file dropped"], "label": "Malware staging activity"},
+        {"field": "action", "keywords": ["logon failure"], "label": "Authentication failures"},
+        {"field": "target", "keywords": ["syscheck"], "label": "Mass filesystem changes"},
+        {"field": "action", "keywords": ["firewall", "pfsense"], "label": "Blocked network activity"}
+    ],
+    "significance": {
+        "stage_weights": {
+            "Initial Access": 3,
+            "Execution": 4,
+            "Privilege Escalation": 5,
+            "Persistence": 5,
+            "Network Activity": 2,
+            "Activity": 1
+        },
+        "default_weight": 1,
+        "action_keywords": [
+            {"keywords": ["account", "user", "group"], "points": 4},
+            {"keywords": ["powershell", "script", "command"], "points": 3},
+            {"keywords": ["service", "registry", "scheduled task"], "points": 4},
+            {"keywords": ["executable", "dll", "payload"], "points": 4},
+            {"keywords": ["logon failure", "authentication"], "points": 2}
+        ],
+        "bulk_count": 20,
+        "bulk_points": 1
+    },
+    "assessments": [
+        {"keywords": ["account"], "text": "- Evidence of account manipulation.\n"},
+        {"keywords": ["powershell", "script"], "text": "- Script-based execution activity detected.\n"},
+        {"keywords": ["service", "persistence"], "text": "- Potential persistence mechanisms were established.\n"}
+    ]
+}
+
+
+STAGE_FIELDS = ("action_category", "system_type", "actor")
+LABEL_FIELDS = ("action", "target")
+
+
+# --- multi-keyword matching ---
+
+def trie_regex(words):
+    # One alternation shaped like a trie: at any position the engine follows
+    # a single branch and, with greedy optionals, ends on the longest word.
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node):
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+EMPTY = frozenset()
+
+
+class KeywordMatcher:
+    """
+    Finds every keyword occurring in a string in one scan.
+
+    The pattern returns non-overlapping leftmost-longest matches. Keywords
+    inside a match are implied by it; the only ones a match can hide are
+    those overlapping its end, and those are confirmed with a plain
+    substring check.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = sorted({k.lower() for k in keywords if k})
+        self.pattern = re.compile(trie_regex(self.keywords)) if self.keywords else None
+
+        self.implied = {kw: frozenset(k for k in self.keywords if k in kw) for kw in self.keywords}
+        self.straddling = {
+            kw: tuple(
+                k for k in self.keywords
+                if any(kw.endswith(k[:n]) for n in range(1, min(len(k), len(kw))))
+            )
+            for kw in self.keywords
+        }
+
+    def scan(self, text):
+        if not self.pattern or not text:
+            return EMPTY
+
+        hits = set(self.pattern.findall(text))
+        if not hits:
+            return EMPTY
+
+        found = set().union(*[self.implied[kw] for kw in hits])
+        for kw in hits:
+            found.update(k for k in self.straddling[kw] if k in text)
+
+        return frozenset(found)
+
+
+# --- compiled rule set ---
+
+class RuleSet:
+    def __init__(self, rules, source="defaults"):
+        self.rules = rules
+        self.source = source
+        self.fingerprint = hashlib.sha256(
+            json.dumps(rules, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+
+        noise = rules["noise"]
+        significance = rules["significance"]
+
+        self.noise_min_severity = noise["min_severity"]
+        self.noise_targets = frozenset(t.lower() for t in noise["targets"])
+        self.noise_prefixes = tuple(p.lower() for p in noise["action_prefixes"])
+        self.noise_keywords = frozenset(k.lower() for k in noise["action_keywords"])
+
+        self.stage_rules = [
+            (r["field"], frozenset(k.lower() for k in r["keywords"]), r["stage"])
+            for r in rules["stages"]
+        ]
+        self.default_stage = rules["default_stage"]
+
+        self.label_rules = [
+            (r["field"], frozenset(k.lower() for k in r["keywords"]), r["label"])
+            for r in rules["labels"]
+        ]
+
+        unknown = {r[0] for r in self.stage_rules} - set(STAGE_FIELDS) | \
+                  {r[0] for r in self.label_rules} - set(LABEL_FIELDS)
+        if unknown:
+            raise ValueError(f"Rules cannot match on fields {sorted(unknown)}")
+
+        self.stage_weights = significance["stage_weights"]
+        self.default_weight = significance["default_weight"]
+        self.point_rules = [
+            (frozenset(k.lower() for k in r["keywords"]), r["points"])
+            for r in significance["action_keywords"]
+        ]
+        self.bulk_count = significance["bulk_count"]
+        self.bulk_points = significance["bulk_points"]
+
+        self.assessment_rules = [
+            (frozenset(k.lower() for k in r["keywords"]), r["text"])
+            for r in rules["assessments"]
+        ]
+
+        # one matcher per scanned field, covering every rule that reads it
+        fields = {field: set() for field in STAGE_FIELDS + LABEL_FIELDS}
+        for field, keywords, _ in self.stage_rules + self.label_rules:
+            fields[field].update(keywords)
+        action = fields["action"]
+        action.update(self.noise_keywords)
+        for keywords, _ in self.point_rules + self.assessment_rules:
+            action.update(keywords)
+
+        self.matchers = {field: KeywordMatcher(keywords) for field, keywords in fields.items()}
+
+        cached = lru_cache(maxsize=CLASSIFICATION_CACHE_SIZE)
+        self.scan = cached(self._scan)
+        self.stage = cached(self._stage)
+        self.label = cached(self._label)
+        self.is_noise = cached(self._is_noise)
+        self.significance = cached(self._significance)
+
+    def _scan(self, field, value):
+        return self.matchers[field].scan((value or "").lower())
+
+    def _stage(self, action_category, system_type, actor):
+        values = {"action_category": action_category, "system_type": system_type, "actor": actor}
+
+        for field, keywords, stage in self.stage_rules:
+            if not keywords.isdisjoint(self.scan(field, values[field])):
+                return stage
+
+        return self.default_stage
+
+    def _label(self, action_operation, target):
+        found = {"action": self.scan("action", action_operation), "target": self.scan("target", target)}
+
+        for field, keywords, label in self.label_rules:
+            if not keywords.isdisjoint(found[field]):
+                return label
+
+        return action_operation
+
+    def _is_noise(self, action_operation, target, severity):
+        if (target or "").lower() in self.noise_targets:
+            return True
+
+        # same cache key as the label and significance lookups: one scan
+        found = self.scan("action", action_operation)
+        if (action_operation or "").lower().startswith(self.noise_prefixes) or not found.isdisjoint(self.noise_keywords):
+            return True
+
+        return int(severity or 0) < self.noise_min_severity
+
+    def _significance(self, stage, action, bulk):
+        score = self.stage_weights.get(stage, self.default_weight)
+        found = self.scan("action", action)
+
+        for keywords, points in self.point_rules:
+            if not keywords.isdisjoint(found):
+                score += points
+
+        if bulk:
+            score += self.bulk_points
+
+        return score
+
+    def assessments(self, actions_text):
+        found = self.matchers["action"].scan(actions_text)
+        return [text for keywords, text in self.assessment_rules if not keywords.isdisjoint(found)]
+
+    def describe(self):
+        return {"source": self.source, "fingerprint": self.fingerprint, "rules": self.rules}
+
+
+# --- active rules ---
+
+_lock = threading.RLock()
+_active = None
+
+
+def read_rules(path=None):
+    path = path or os.getenv("RULES_FILE")
+    if not path:
+        return DEFAULT_RULES, "defaults"
+
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+
+    unknown = set(overrides) - set(DEFAULT_RULES)
+    if unknown:
+        raise ValueError(f"Unknown rule sections: {sorted(unknown)}")
+
+    return {**DEFAULT_RULES, **overrides}, path
+
+
+def reload_rules(path=None):
+    # Compiles first and swaps only on success, so a bad file leaves the
+    # running rules in place.
+    global _active
+    rules, source = read_rules(path)
+    try:
+        compiled = RuleSet(rules, source)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid rule table: {e!r}")
+
+    with _lock:
+        _active = compiled
+    return compiled
+
+
+def active_rules():
+    if _active is None:
+        with _lock:
+            if _active is None:
+                return reload_rules()
+    return _active
@@ -1,8 +1,13 @@
 import uuid
+from bisect import bisect_left, insort
 from datetime import timedelta
 
 LINK_WINDOW = timedelta(seconds=8)
 
+# Most recent predecessors of each stage considered per block, so a dense
+# burst cannot turn linking quadratic.
+MAX_LINK_CANDIDATES = 32
+
 STAGE_ORDER = [
     "Initial Access",
     "Execution",
@@ -20,66 +25,152 @@ HIGH_VALUE = {
     ("Privilege Escalation", "Persistence"),
 }
 
+# stage -> the stages that progress into it
+PREDECESSORS = {}
+for _before, _after in HIGH_VALUE:
+    PREDECESSORS.setdefault(_after, []).append(_before)
 
-def build_storylines(compressed_events):
-    links = []
+# Storyline ids are derived from their steps, so rebuilding from the same
+# evidence yields the same ids.
+STORYLINE_NAMESPACE = uuid.UUID("3b9d6c2a-7e41-5f08-b3c5-9d2e1a4f6b70")
+
+
+def link_reasons(a, b):
+    reasons = []
+
+    if a["system"] != b["system"]:
+        reasons.append("cross-system behavior")
 
-    for i in range(len(compressed_events) - 1):
-        a = compressed_events[i]
-        b = compressed_events[i + 1]
+    if a.get("source_ip") and a.get("source_ip") == b.get("source_ip"):
+        reasons.append("same source")
 
-        reasons = []
+    if b["start_time"] - a["end_time"] <= LINK_WINDOW:
+        reasons.append("temporal proximity")
 
-        if a["system"] != b["system"]:
-            reasons.append("cross-system behavior")
+    if (a["stage"], b["stage"]) in HIGH_VALUE:
+        reasons.append("meaningful attack progression")
 
-        if a.get("source_ip") and a.get("source_ip") == b.get("source_ip"):
-            reasons.append("same source")
+    return reasons
 
-        if b["start_time"] - a["end_time"] <= LINK_WINDOW:
-            reasons.append("temporal proximity")
 
-        if (a["stage"], b["stage"]) in HIGH_VALUE:
-            reasons.append("meaningful attack progression")
+def is_link(a, b):
+    # a HIGH_VALUE progression plus two of: other system, same source, proximity
+    if (a["stage"], b["stage"]) not in HIGH_VALUE:
+        return False
+
+    source = a.get("source_ip")
+    signals = (
+        (a["system"] != b["system"])
+        + bool(source and source == b.get("source_ip"))
+        + (b["start_time"] - a["end_time"] <= LINK_WINDOW)
+    )
+    return signals >= 2
+
+
+def build_storylines(compressed_events):
+    """
+    Links blocks into attack chains.
+
+    A block can follow any earlier block of a HIGH_VALUE predecessor stage
+    that ended within LINK_WINDOW of its start, not only the block right
+    before it; the directly preceding block is still considered at any
+    distance, as before. Earlier blocks are indexed per stage by end time,
+    so each block only looks at its window. Links always point forward in
+    the list, which makes them a DAG: every block keeps the predecessor
+    that gives the longest chain ending at it, and storylines are read back
+    from the longest chains, each block used once.
+    """
+    blocks = compressed_events
+
+    # stage -> [(end_time, index)] of blocks seen so far
+    ends = {}
+    length = [1] * len(blocks)
+    parent = [None] * len(blocks)
+
+    for i, b in enumerate(blocks):
+        best = None
+
+        for j in candidates(blocks, ends, i):
+            a = blocks[j]
+            if not is_link(a, b):
+                continue
+
+            rank = (length[j], a["end_time"], j)
+            if best is None or rank > best:
+                best = rank
+
+        if best:
+            j = best[2]
+            length[i] = length[j] + 1
+            parent[i] = (j, link_reasons(blocks[j], b))
+
+        insort(ends.setdefault(b["stage"], []), (b["end_time"], i))
+
+    return chain_links_into_storylines(blocks, length, parent)
+
+
+def candidates(blocks, ends, i):
+    b = blocks[i]
+    found = set()
+
+    for stage in PREDECESSORS.get(b["stage"], ()):
+        indexed = ends.get(stage)
+        if not indexed:
+            continue
 
-        if len(reasons) >= 3 and (a["stage"], b["stage"]) in HIGH_VALUE:
-            links.append((a, b, reasons))
+        first = bisect_left(indexed, (b["start_time"] - LINK_WINDOW,))
+        for _, j in indexed[max(first, len(indexed) - MAX_LINK_CANDIDATES):]:
+            found.add(j)
 
-    return chain_links_into_storylines(links)
+    if i:
+        found.add(i - 1)
 
+    return found
 
-def chain_links_into_storylines(links):
-    storylines = []
+
+def chain_links_into_storylines(blocks, length, parent):
+    chains = []
     used = set()
 
-    for a, b, reasons in links:
-        if id(a) in used:
+    # longest chains first; a chain stops early where an earlier, longer
+    # storyline already claimed the block
+    for end in sorted(range(len(blocks)), key=lambda i: (-length[i], i)):
+        if length[end] < 2:
+            break
+        if end in used:
+            continue
+
+        steps = [end]
+        reasoning = []
+        node = end
+
+        while parent[node] and parent[node][0] not in used:
+            node, reasons = parent[node]
+            steps.append(node)
+            reasoning = reasons + reasoning
+
+        if len(steps) < 2:
             continue
 
-        storyline = {
-            "storyline_id": str(uuid.uuid4()),
-            "systems": set([a["system"], b["system"]]),
-            "steps": [a, b],
-            "reasoning": list(set(reasons)),
-            "confidence": "medium"
-        }
-
-        used.add(id(a))
-        used.add(id(b))
-        current = b
-
-        for x, y, r in links:
-            if x == current:
-                storyline["steps"].append(y)
-                storyline["systems"].add(y["system"])
-                storyline["reasoning"].extend(r)
-                used.add(id(y))
-                current = y
-
-        storyline["systems"] = list(storyline["systems"])
-        storyline["reasoning"] = list(set(storyline["reasoning"]))
-        storyline["confidence"] = "high" if len(storyline["steps"]) >= 3 else "medium"
-
-        storylines.append(storyline)
-
-    return storylines
+        used.update(steps)
+        chains.append((steps[::-1], reasoning))
+
+    # reported in the order the chains start
+    chains.sort(key=lambda chain: chain[0][0])
+    return [storyline(blocks, steps, reasoning) for steps, reasoning in chains]
+
+
+def storyline(blocks, steps, reasoning):
+    chain = [blocks[i] for i in steps]
+    key = "|".join(
+        f"{step['system']}:{step['stage']}:{step['action']}:{step['start_time'].isoformat()}"
+        for step in (chain[0], chain[-1])
+    )
+
+    return {
+        "storyline_id": str(uuid.uuid5(STORYLINE_NAMESPACE, key)),
+        "systems": list(dict.fromkeys(step["system"] for step in chain)),
+        "steps": chain,
+        "reasoning": list(dict.fromkeys(reasoning)),
+        "confidence": "high" if len(chain) >= 3 else "medium"
+    }
@@ -0,0 +1,237 @@
+import base64
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import and_, exists, or_
+
+from app.models import EvidenceEvent, Incident, IncidentTimeline, IncidentFacet
+from app.event_record import load_records
+from app.incident_builder import generate_narrative
+from app.event_compressor import compress_events
+from app.storyline_builder import build_storylines
+from app.rule_table import active_rules
+
+# Bump when compression, storyline or narrative logic changes so stored
+# interpretations are rebuilt from the (unchanged) evidence.
+DERIVATION_VERSION = 5
+
+
+def derivation_tag():
+    # code version plus the active rule table: reloading different rules
+    # makes every stored view (and ETag) stale
+    return f"v{DERIVATION_VERSION}:{active_rules().fingerprint}"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_json(v) for v in value]
+    return value
+
+
+def evidence_hash(session, incident_id):
+    digest = hashlib.sha256(derivation_tag().encode("utf-8"))
+
+    rows = session.query(EvidenceEvent.current_hash)\
+        .filter(EvidenceEvent.incident_id == incident_id)\
+        .order_by(EvidenceEvent.chain_seq)
+
+    for (current_hash,) in rows:
+        digest.update(current_hash.encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def incident_events(session, incident_id):
+    return load_records(session, EvidenceEvent.incident_id == incident_id)
+
+
+def derive(events):
+    compressed = compress_events(events)
+    storylines = build_storylines(compressed)
+    narrative = generate_narrative(compressed, storylines)
+    return compressed, storylines, narrative
+
+
+def write_facets(session, inc, stages):
+    session.query(IncidentFacet)\
+        .filter(IncidentFacet.incident_id == inc.incident_id)\
+        .delete(synchronize_session=False)
+
+    facets = [("system", s) for s in inc.systems or []] + [("stage", s) for s in stages]
+    session.add_all([
+        IncidentFacet(incident_id=inc.incident_id, kind=kind, value=value)
+        for kind, value in sorted(set(facets))
+    ])
+
+
+def is_current(stored, inc):
+    return (
+        stored.derivation_version == DERIVATION_VERSION
+        and stored.rules_fingerprint == active_rules().fingerprint
+        and stored.last_seq == inc.last_seq
+        and stored.event_count == inc.event_count
+    )
+
+
+def incident_timeline(session, inc):
+    """
+    Returns the stored interpretation of an incident, rebuilding it only when
+    the incident's evidence changed.
+
+    A closed incident whose row signature (last_seq, event_count) matches the
+    stored view is served without touching its evidence. Anything else is
+    checked against a content hash of the incident's evidence.
+    """
+    stored = session.get(IncidentTimeline, inc.incident_id)
+
+    if stored and inc.status == "closed" and is_current(stored, inc):
+        return stored
+
+    content_hash = evidence_hash(session, inc.incident_id)
+
+    if stored and stored.evidence_hash == content_hash:
+        stored.last_seq = inc.last_seq
+        stored.event_count = inc.event_count
+        return stored
+
+    compressed, storylines, narrative = derive(incident_events(session, inc.incident_id))
+    stages = sorted({block["stage"] for block in compressed})
+
+    if not stored:
+        stored = IncidentTimeline(incident_id=inc.incident_id)
+        session.add(stored)
+
+    stored.evidence_hash = content_hash
+    stored.derivation_version = DERIVATION_VERSION
+    stored.rules_fingerprint = active_rules().fingerprint
+    stored.last_seq = inc.last_seq
+    stored.event_count = inc.event_count
+
+    stored.timeline = to_json(compressed)
+    stored.storylines = to_json(storylines)
+    stored.narrative = narrative
+
+    stored.stages = stages
+    stored.block_count = len(compressed)
+    stored.storyline_count = len(storylines)
+    stored.max_significance = max((block["significance"] for block in compressed), default=0)
+
+    write_facets(session, inc, stages)
+    return stored
+
+
+def refresh_timelines(session):
+    # Brings every stale or missing view up to date so listings and filters
+    # can be answered from the summary columns alone.
+    stale = session.query(Incident)\
+        .outerjoin(IncidentTimeline, IncidentTimeline.incident_id == Incident.incident_id)\
+        .filter(or_(
+            IncidentTimeline.incident_id.is_(None),
+            Incident.status == "open",
+            IncidentTimeline.derivation_version != DERIVATION_VERSION,
+            IncidentTimeline.rules_fingerprint.is_distinct_from(active_rules().fingerprint),
+            IncidentTimeline.last_seq != Incident.last_seq,
+            IncidentTimeline.event_count != Incident.event_count
+        ))\
+        .all()
+
+    for inc in stale:
+        incident_timeline(session, inc)
+
+    session.commit()
+    return len(stale)
+
+
+def incident_view(inc, stored):
+    return {
+        "incident_id": inc.incident_id,
+        "start_time": inc.start_time,
+        "end_time": inc.end_time,
+        "systems": inc.systems,
+
+        "storylines": stored.storylines,
+        "timeline": stored.timeline,
+        "narrative": stored.narrative
+    }
+
+
+def incident_summary(inc, stored):
+    return {
+        "incident_id": inc.incident_id,
+        "status": inc.status,
+        "start_time": inc.start_time,
+        "end_time": inc.end_time,
+        "systems": inc.systems,
+        "event_count": inc.event_count,
+
+        "stages": stored.stages,
+        "block_count": stored.block_count,
+        "storyline_count": stored.storyline_count,
+        "max_significance": stored.max_significance
+    }
+
+
+# --- listing ---
+
+def encode_cursor(inc):
+    raw = f"{inc.start_time.isoformat()}|{inc.incident_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        start, incident_id = raw.split("|", 1)
+        return datetime.fromisoformat(start), incident_id
+    except (ValueError, UnicodeError):
+        raise ValueError("Malformed cursor")
+
+
+def has_facet(kind, value):
+    return exists().where(and_(
+        IncidentFacet.incident_id == Incident.incident_id,
+        IncidentFacet.kind == kind,
+        IncidentFacet.value == value
+    ))
+
+
+def query_incidents(session, since=None, until=None, system=None, stage=None, min_significance=None):
+    q = session.query(Incident, IncidentTimeline)\
+        .join(IncidentTimeline, IncidentTimeline.incident_id == Incident.incident_id)
+
+    if since:
+        q = q.filter(Incident.end_time >= since)
+    if until:
+        q = q.filter(Incident.start_time <= until)
+    if system:
+        q = q.filter(has_facet("system", system))
+    if stage:
+        q = q.filter(has_facet("stage", stage))
+    if min_significance is not None:
+        q = q.filter(IncidentTimeline.max_significance >= min_significance)
+
+    return q.order_by(Incident.start_time, Incident.incident_id)
+
+
+def page_incidents(query, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if cursor:
+        start, incident_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Incident.start_time > start,
+            and_(Incident.start_time == start, Incident.incident_id > incident_id)
+        ))
+
+    rows = query.limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    return rows, encode_cursor(rows[-1][0]) if more else None
@@ -1,6 +1,10 @@
 import streamlit as st
 import requests
+import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -67,28 +71,114 @@ st.title("KnightEye Investigation Console")
 st.caption("Digital crime-scene reconstruction & attack storyline engine")
 
 # Fetch incidents
-@st.cache_data(ttl=10)
-def fetch_timeline():
-    return requests.get(f"{API_BASE}/timeline").json()
-
-data = fetch_timeline()
+#
+# Responses are revalidated with If-None-Match on every rerun; the API
+# answers 304 when nothing was ingested, so the stored copy is reused.
+# Shared by every session, so only the most recently used are kept.
+CONDITIONAL_ENTRIES = 64
+
+@st.cache_resource
+def conditional_store():
+    return OrderedDict(), threading.Lock()
+
+def get_json(path, params=None):
+    store, lock = conditional_store()
+    key = (path, tuple(sorted((params or {}).items())))
+    with lock:
+        etag, data = store.get(key, (None, None))
+
+    r = requests.get(
+        f"{API_BASE}{path}",
+        params=params,
+        headers={"If-None-Match": etag} if etag else {}
+    )
+    if r.status_code == 304:
+        with lock:
+            if key in store:
+                store.move_to_end(key)
+        return data
+
+    r.raise_for_status()
+    data = r.json()
+    if r.headers.get("ETag"):
+        with lock:
+            store[key] = (r.headers["ETag"], data)
+            store.move_to_end(key)
+            while len(store) > CONDITIONAL_ENTRIES:
+                store.popitem(last=False)
+    return data
+
+INCIDENT_PAGE_SIZE = 50
+
+def fetch_incidents(system=None, stage=None, min_significance=0, cursor=None, limit=INCIDENT_PAGE_SIZE):
+    # one page of summaries, with the total matching the filters
+    params = {"limit": limit}
+    if system:
+        params["system"] = system
+    if stage:
+        params["stage"] = stage
+    if min_significance:
+        params["min_significance"] = min_significance
+    if cursor:
+        params["cursor"] = cursor
+
+    return get_json("/incidents", params)
+
+def fetch_incident(incident_id):
+    return get_json(f"/incidents/{incident_id}")
 
 # Sidebar
 st.sidebar.title("Case Console")
 
+filter_system = st.sidebar.text_input("Filter by system")
+filter_stage = st.sidebar.text_input("Filter by stage")
+filter_significance = st.sidebar.slider("Minimum significance", 0, 10, 0)
+
+# cursors of the pages visited under the current filters
+filters = (filter_system.strip(), filter_stage.strip(), filter_significance)
+if st.session_state.get("incident_filters") != filters:
+    st.session_state.incident_filters = filters
+    st.session_state.incident_cursors = [None]
+cursors = st.session_state.incident_cursors
+
+page = fetch_incidents(*filters, cursor=cursors[-1])
+data = page["items"]
+
+def show_job(job, slot):
+    slot.info(
+        f"Collection {job['state']} — {job['stored']} new events "
+        f"({job['events_per_sec']} events/sec, {job['cycles']} passes)"
+    )
+
 if st.sidebar.button("Collect Latest Telemetry"):
-    with st.spinner("Collecting events from Wazuh..."):
-        try:
-            r = requests.get(f"{API_BASE}/collect/wazuh", timeout=120)
-            result = r.json()
-            st.sidebar.success(f"Ingestion complete — {result.get('stored', 0)} new events")
-            st.cache_data.clear()
-        except Exception as e:
-            st.sidebar.error("Collection failed")
-            st.sidebar.code(str(e))
+    try:
+        job = requests.post(f"{API_BASE}/collect/jobs", timeout=10).json()
+        slot = st.sidebar.empty()
+
+        # a tailing job never finishes; just report on it
+        while job["mode"] == "once" and job["state"] not in ("finished", "failed", "stopped"):
+            show_job(job, slot)
+            time.sleep(1)
+            job = requests.get(f"{API_BASE}/collect/jobs/{job['job_id']}", timeout=10).json()
+
+        if job["state"] == "failed":
+            slot.error("Collection failed")
+            st.sidebar.code(job["error"])
+        elif job["mode"] == "tail":
+            show_job(job, slot)
+        else:
+            slot.success(f"Ingestion complete — {job['stored']} new events")
+    except requests.exceptions.RequestException as e:
+        st.sidebar.error("Collection failed")
+        st.sidebar.code(str(e))
 
 st.sidebar.divider()
 
+if not data and len(cursors) > 1:
+    # the page emptied since it was reached; start from the first
+    st.session_state.incident_cursors = [None]
+    st.rerun()
+
 if not data:
     st.warning("No incidents available. Ingest telemetry first.")
     st.stop()
@@ -96,7 +186,19 @@ if not data:
 incident_ids = [i["incident_id"] for i in data]
 selected_id = st.sidebar.selectbox("Active Incident", incident_ids)
 
-incident = next(i for i in data if i["incident_id"] == selected_id)
+page_count = -(-page["total"] // INCIDENT_PAGE_SIZE)
+st.sidebar.caption(f"Page {len(cursors)} of {page_count} · {page['total']} incidents")
+prev_col, next_col = st.sidebar.columns(2)
+if prev_col.button("← Previous", disabled=len(cursors) == 1):
+    cursors.pop()
+    st.rerun()
+if next_col.button("Next →", disabled=not page["next_cursor"]):
+    cursors.append(page["next_cursor"])
+    st.rerun()
+
+live_mode = st.sidebar.toggle("Live mode", help="Stream new evidence as it is collected")
+
+incident = fetch_incident(selected_id)
 
 # Incident overview
 st.subheader("Incident Overview")
@@ -168,14 +270,14 @@ st.divider()
 # Forensic timeline
 st.subheader("Forensic Timeline (High-Value Evidence Only)")
 
-for ev in incident["timeline"]:
+def render_block(ev, container=st):
     sig_class = (
         "sig-high" if ev["significance"] >= 8 else
         "sig-med" if ev["significance"] >= 5 else
         "sig-low"
     )
 
-    st.markdown(f"""
+    container.markdown(f"""
     <div class="case-box {sig_class}">
         <div class="stage">{ev['stage']}</div>
         <div class="meta">{ev['start_time']} → {ev['end_time']}</div>
@@ -190,6 +292,15 @@ for ev in incident["timeline"]:
     </div>
     """, unsafe_allow_html=True)
 
+# one placeholder per block index, so a block pushed again replaces itself
+block_slots = {}
+for index, ev in enumerate(incident["timeline"]):
+    block_slots[index] = st.empty()
+    render_block(ev, block_slots[index])
+
+# Blocks pushed by the API while live mode is on
+live_blocks = st.container()
+
 st.divider()
 
 # Investigation narrative
@@ -214,3 +325,55 @@ if st.button("Verify Evidence Chain"):
         st.json(result)
 
 st.caption("KnightEye · Investigation Console · Digital Evidence Correlation Engine")
+
+# Live mode
+#
+# Listens on the Server-Sent Events feed and redraws changed blocks of the
+# active incident in place, appending new ones. The page reruns (cheaply, via conditional
+# requests) when a new incident appears or the listening window ends.
+LIVE_WINDOW_SECONDS = 60
+
+def sse_events(response):
+    event = {}
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if "data" in event:
+                yield event.get("event", "message"), json.loads(event["data"])
+            event = {}
+        elif line.startswith(":"):
+            yield "keepalive", None
+        else:
+            field, _, value = line.partition(":")
+            event[field] = value.lstrip()
+
+if live_mode:
+    status = st.sidebar.empty()
+    status.info("Live — waiting for evidence…")
+    deadline = time.time() + LIVE_WINDOW_SECONDS
+
+    try:
+        with requests.get(f"{API_BASE}/timeline/live", stream=True, timeout=30) as r:
+            for kind, payload in sse_events(r):
+                if kind == "evidence":
+                    status.info(f"Live — {payload['stored']} events stored (head {payload['head_seq']})")
+                elif kind == "resync":
+                    # the feed dropped messages for us; reload the page
+                    break
+                elif kind == "incident" and payload["incident_id"] not in incident_ids:
+                    # on another page, unless the count of matches grew
+                    if fetch_incidents(*filters, limit=1)["total"] != page["total"]:
+                        st.toast(f"New incident {payload['incident_id'][:8]}… on {', '.join(payload['systems'])}")
+                        break
+                elif kind == "block" and payload["incident_id"] == selected_id:
+                    slot = block_slots.get(payload["index"])
+                    if slot is None:
+                        slot = block_slots[payload["index"]] = live_blocks.empty()
+                    render_block(payload["block"], slot)
+
+                if time.time() > deadline:
+                    break
+    except requests.exceptions.RequestException as e:
+        status.warning(f"Live feed interrupted: {e}")
+        time.sleep(2)
+
+    st.rerun()
@@ -1,14 +1,83 @@
+import random
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from app.collection_profile import PROFILES
+
+POOL_SIZE = 8
+REQUEST_TIMEOUT = (10, 120)
+
+MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+PIT_KEEP_ALIVE = "5m"
+
 
 class WazuhClient:
-    def __init__(self, base_url, username, password, verify_ssl=False):
+    def __init__(self, base_url, username, password, verify_ssl=False,
+                 max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT, profile=None):
         self.base_url = base_url
         self.auth = (username, password)
         self.verify_ssl = verify_ssl
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.profile = profile or PROFILES["full"]
 
-    def get_recent_events(self, since_ts, since_id=None, size=500, indices="wazuh-alerts-*"):
-        url = f"{self.base_url}/{indices}/_search"
+        # One pooled keep-alive session for the lifetime of the client, so
+        # paging does not pay a TCP+TLS handshake per request.
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        self.session.verify = verify_ssl
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Content-Type": "application/json"
+        })
+
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # --- transport ---
+
+    def request(self, method, path, **kwargs):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                r = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                self.backoff(attempt)
+                continue
+
+            if r.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                self.backoff(attempt, r.headers.get("Retry-After"))
+                continue
+
+            r.raise_for_status()
+            return r.json()
+
+    def backoff(self, attempt, retry_after=None):
+        # exponential backoff with full jitter, never shorter than Retry-After
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+        if retry_after:
+            try:
+                delay = max(delay, min(BACKOFF_CAP, float(retry_after)))
+            except ValueError:
+                pass
+
+        time.sleep(delay)
+
+    def close(self):
+        self.session.close()
+
+    # --- search ---
 
+    def search_body(self, since_ts, since_id=None, size=500):
         body = {
             "size": size,
             "sort": [
@@ -25,7 +94,73 @@ class WazuhClient:
         if since_id:
             body["search_after"] = [since_ts, since_id]
 
-        r = requests.get(url, auth=self.auth, json=body, verify=self.verify_ssl)
-        r.raise_for_status()
-        data = r.json()
+        return self.profile.apply(body)
+
+    def get_recent_events(self, since_ts, since_id=None, size=500, indices="wazuh-alerts-*"):
+        body = self.search_body(since_ts, since_id, size)
+        data = self.request("GET", f"{indices}/_search", json=body)
         return data.get("hits", {}).get("hits", [])
+
+    # --- point-in-time paging ---
+
+    def open_pit(self, indices, keep_alive=PIT_KEEP_ALIVE):
+        data = self.request(
+            "POST",
+            f"{indices}/_search/point_in_time",
+            params={"keep_alive": keep_alive}
+        )
+        return data["pit_id"]
+
+    def close_pit(self, pit_id):
+        try:
+            self.request("DELETE", "_search/point_in_time", json={"pit_id": [pit_id]})
+        except requests.RequestException:
+            # PITs expire on their own after keep_alive
+            pass
+
+    def iter_pages(self, since_ts, since_id=None, size=500, indices="wazuh-alerts-*", use_pit=True):
+        pit_id = None
+
+        if use_pit:
+            try:
+                pit_id = self.open_pit(indices)
+            except requests.HTTPError as e:
+                # indexers older than OpenSearch 2.4 have no PIT API
+                if e.response is None or e.response.status_code not in (400, 404, 405):
+                    raise
+
+        if not pit_id:
+            yield from self.iter_search_after_pages(since_ts, since_id, size, indices)
+            return
+
+        try:
+            body = self.search_body(since_ts, since_id, size)
+            body["pit"] = {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE}
+
+            while True:
+                data = self.request("POST", "_search", json=body)
+                hits = data.get("hits", {}).get("hits", [])
+                if not hits:
+                    return
+
+                yield hits
+
+                # the PIT id may be refreshed by the indexer between pages
+                pit_id = data.get("pit_id", pit_id)
+                body["pit"]["id"] = pit_id
+                body["search_after"] = hits[-1].get("sort") or [
+                    hits[-1]["_source"]["@timestamp"], hits[-1]["_id"]
+                ]
+        finally:
+            self.close_pit(pit_id)
+
+    def iter_search_after_pages(self, since_ts, since_id=None, size=500, indices="wazuh-alerts-*"):
+        while True:
+            hits = self.get_recent_events(since_ts, since_id, size, indices)
+            if not hits:
+                return
+
+            yield hits
+
+            since_ts = hits[-1]["_source"]["@timestamp"]
+            since_id = hits[-1]["_id"]
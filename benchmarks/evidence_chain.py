@@ -0,0 +1,108 @@
+"""
+Evidence chain hashing: generic json.dumps vs the fixed-field canonical encoder.
+
+    python -m benchmarks.evidence_chain [--events N]
+
+Asserts the two encodings are byte-identical before timing anything.
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+from types import SimpleNamespace
+
+from app.evidence_chain import (
+    EVIDENCE_FIELDS,
+    evidence_dict,
+    canonical_json,
+    chain_hashes,
+    chain_record_hashes
+)
+
+
+def synthetic_events(n, seed=7):
+    rng = random.Random(seed)
+    actions = ["sshd: authentication failed", "New user added to the system", "Logon failure - Unknown user or bad password", "Integrity checksum changed."]
+
+    events = []
+    for i in range(n):
+        ev = {
+            "system": f"host-{rng.randint(1, 40)}",
+            "system_type": rng.choice(["sshd", "windows", "pfsense", "ossec"]),
+            "source_ip": f"10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}",
+            "actor": rng.choice(["root", "admin", "bob", "unknown", "Dürer"]),
+            "action_category": rng.choice(["authentication_failed", "syscheck", "process"]),
+            "action_operation": rng.choice(actions),
+            "target": rng.choice(["/var/log/auth.log", "syscheck", "EventChannel"]),
+            "raw_log": f"Oct 18 12:00:{i % 60:02d} host sshd[{i}]: \"quoted\" \\ tab\t ünïcode ✓ {rng.random()}",
+            "severity": str(rng.randint(0, 15)),
+            "wazuh_id": f"{1700000000 + i}.{rng.randint(0, 10**6)}",
+            "wazuh_index": "wazuh-alerts-4.x-2026.10.18",
+            "wazuh_timestamp": "2026-10-18T12:00:00.000+0000",
+            "rule_id": str(rng.randint(1000, 99999)),
+            "mitre": json.dumps({"id": ["T1110"]}, sort_keys=True) if i % 3 else None,
+            "agent_id": f"{rng.randint(0, 99):03d}",
+            "stage": rng.choice(["Initial Access", "Execution", "Activity"])
+        }
+        events.append(evidence_dict(ev))
+    return events
+
+
+def baseline_chain(prev_hash, events):
+    hashes = []
+    for ev in events:
+        canonical = json.dumps(ev, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        prev_hash = hashlib.sha256((prev_hash + canonical).encode("utf-8")).hexdigest()
+        hashes.append(prev_hash)
+    return hashes
+
+
+def baseline_verify(prev_hash, records):
+    # what verify_incident() used to do: rebuild a dict per row, then dump it
+    hashes = []
+    for record in records:
+        ev = {field: getattr(record, field) for field in EVIDENCE_FIELDS}
+        canonical = json.dumps(ev, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        prev_hash = hashlib.sha256((prev_hash + canonical).encode("utf-8")).hexdigest()
+        hashes.append(prev_hash)
+    return hashes
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events)
+
+    for ev in events:
+        expected = json.dumps(ev, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        assert canonical_json(ev) == expected
+
+    records = [SimpleNamespace(**ev) for ev in events]
+
+    base, base_s = timed(baseline_chain, "GENESIS", events)
+    fast, fast_s = timed(chain_hashes, "GENESIS", events)
+    assert base == fast
+
+    vbase, vbase_s = timed(baseline_verify, "GENESIS", records)
+    vfast, vfast_s = timed(chain_record_hashes, "GENESIS", records)
+    assert vbase == vfast == base
+
+    print(f"events: {args.events} ({len(EVIDENCE_FIELDS)} fields)")
+    print()
+    print(f"ingest  json.dumps:  {base_s:.3f}s  ({args.events / base_s:,.0f} ev/s)")
+    print(f"ingest  canonical:   {fast_s:.3f}s  ({args.events / fast_s:,.0f} ev/s)  {base_s / fast_s:.2f}x")
+    print(f"verify  json.dumps:  {vbase_s:.3f}s  ({args.events / vbase_s:,.0f} ev/s)")
+    print(f"verify  canonical:   {vfast_s:.3f}s  ({args.events / vfast_s:,.0f} ev/s)  {vbase_s / vfast_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()